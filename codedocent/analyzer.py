@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import functools
+import gzip
 import hashlib
 import json
 import os
@@ -10,6 +12,7 @@ import sys
 import tempfile
 import threading
 import time
+import zlib
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from codedocent.parser import CodeNode
@@ -24,7 +27,16 @@ try:
 except ImportError:
     ollama = None  # type: ignore[assignment]
 
-CACHE_FILENAME = ".codedocent_cache.json"
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+CACHE_FILENAME = ".codedocent_cache.json.gz"
+# Stripping this suffix gives the pre-gzip plain-JSON cache name, which
+# is read once as a migration and removed after the next save
+_LEGACY_CACHE_SUFFIX = ".gz"
+_GZIP_MAGIC = b"\x1f\x8b"
 MAX_SOURCE_LINES = 200
 MIN_LINES_FOR_AI = 3
 
@@ -37,9 +49,33 @@ def _md5(data: bytes) -> "hashlib._Hash":
         return hashlib.md5(data)  # nosec B324
 
 
-def _count_nodes(node: CodeNode) -> int:
-    """Recursive count of all nodes in tree."""
-    return 1 + sum(_count_nodes(c) for c in node.children)
+_PROMPT_HEADERS: dict[str, str] = {}
+_PROMPT_FOOTER = "\n```"
+
+
+def _prompt_header(language: str) -> str:
+    """Return the static prompt scaffolding for *language* (memoized)."""
+    header = _PROMPT_HEADERS.get(language)
+    if header is None:
+        header = (
+            f"You are a code explainer for non-programmers. "
+            f"Given the following {language} code, provide:\n\n"
+            f"1. SUMMARY: A plain English explanation (1-3 sentences) "
+            f"that a "
+            f"non-programmer can understand. Explain WHAT it does "
+            f"and WHY, not HOW. "
+            f"Avoid jargon.\n\n"
+            f"2. PSEUDOCODE: A simplified pseudocode version using plain "
+            f"English function/variable names. Keep it short.\n\n"
+            f"Respond in exactly this format:\n"
+            f"SUMMARY: <your summary>\n"
+            f"PSEUDOCODE:\n"
+            f"<your pseudocode>\n\n"
+            f"Here is the code:\n"
+            f"```{language}\n"
+        )
+        _PROMPT_HEADERS[language] = header
+    return header
 
 
 def _build_prompt(node: CodeNode, model: str = "") -> str:
@@ -50,25 +86,7 @@ def _build_prompt(node: CodeNode, model: str = "") -> str:
     if len(lines) > MAX_SOURCE_LINES:
         source = "\n".join(lines[:MAX_SOURCE_LINES])
 
-    prompt = (
-        f"You are a code explainer for non-programmers. "
-        f"Given the following {language} code, provide:\n\n"
-        f"1. SUMMARY: A plain English explanation (1-3 sentences) "
-        f"that a "
-        f"non-programmer can understand. Explain WHAT it does "
-        f"and WHY, not HOW. "
-        f"Avoid jargon.\n\n"
-        f"2. PSEUDOCODE: A simplified pseudocode version using plain English "
-        f"function/variable names. Keep it short.\n\n"
-        f"Respond in exactly this format:\n"
-        f"SUMMARY: <your summary>\n"
-        f"PSEUDOCODE:\n"
-        f"<your pseudocode>\n\n"
-        f"Here is the code:\n"
-        f"```{language}\n"
-        f"{source}\n"
-        f"```"
-    )
+    prompt = _prompt_header(language) + source + _PROMPT_FOOTER
 
     if "qwen3" in model.lower():
         prompt += "\n\n/no_think"
@@ -76,27 +94,32 @@ def _build_prompt(node: CodeNode, model: str = "") -> str:
     return prompt
 
 
+# A <think> block runs to its closing tag, or to end of text if unclosed
+_THINK_RE = re.compile(r"<\|?think\|?>.*?(?:<\|?/think\|?>|\Z)", re.DOTALL)
+
+
 def _strip_think_tags(text: str) -> str:
     """Remove <think>...</think> blocks from model output.
 
     Handles variants: <think>, <|think|>, and unclosed tags.
     """
-    # Remove well-formed pairs (including <|think|> variants)
-    text = re.sub(r"<\|?think\|?>.*?<\|?/think\|?>", "", text, flags=re.DOTALL)
-    # Remove unclosed tags (tag to end of string)
-    text = re.sub(r"<\|?think\|?>.*", "", text, flags=re.DOTALL)
+    if "<" in text:
+        text = _THINK_RE.sub("", text)
     return text.strip()
 
 
+_SUMMARY_RE = re.compile(r"SUMMARY:\s*(.*?)(?=\nPSEUDOCODE:|$)", re.DOTALL)
+_PSEUDOCODE_RE = re.compile(r"PSEUDOCODE:\s*(.*)", re.DOTALL)
+
+
 def _parse_ai_response(text: str) -> tuple[str, str]:
     """Parse SUMMARY and PSEUDOCODE from AI response text."""
     summary = ""
     pseudocode = ""
 
-    summary_match = re.search(
-        r"SUMMARY:\s*(.*?)(?=\nPSEUDOCODE:|$)", text, re.DOTALL
-    )
-    pseudocode_match = re.search(r"PSEUDOCODE:\s*(.*)", text, re.DOTALL)
+    # Cheap substring checks skip the regex scan on unstructured output
+    summary_match = "SUMMARY:" in text and _SUMMARY_RE.search(text)
+    pseudocode_match = "PSEUDOCODE:" in text and _PSEUDOCODE_RE.search(text)
 
     if summary_match:
         summary = summary_match.group(1).strip()
@@ -115,6 +138,33 @@ def _parse_ai_response(text: str) -> tuple[str, str]:
 _AI_TIMEOUT = 120
 
 
+def _call_with_timeout(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)``, waiting at most ``_AI_TIMEOUT`` seconds.
+
+    Raises ``TimeoutError`` if the call does not finish in time; the call
+    is abandoned on a daemon thread so it can never block interpreter exit.
+    Exceptions raised by *func* propagate to the caller.
+    """
+    outcome: list = []
+    done = threading.Event()
+
+    def _run() -> None:
+        try:
+            outcome.append((True, func(*args, **kwargs)))
+        except BaseException as exc:  # pylint: disable=broad-exception-caught
+            outcome.append((False, exc))
+        finally:
+            done.set()
+
+    threading.Thread(target=_run, daemon=True).start()
+    if not done.wait(_AI_TIMEOUT):
+        raise TimeoutError(f"AI call exceeded {_AI_TIMEOUT}s")
+    ok, value = outcome[0]
+    if not ok:
+        raise value
+    return value
+
+
 def _summarize_with_cloud(
     node: CodeNode, ai_config: dict,
 ) -> tuple[str, str] | None:
@@ -126,19 +176,14 @@ def _summarize_with_cloud(
     from codedocent.cloud_ai import cloud_chat  # pylint: disable=import-outside-toplevel  # noqa: E501
 
     prompt = _build_prompt(node, ai_config["model"])
-    pool = ThreadPoolExecutor(max_workers=1)
-    future = pool.submit(
-        cloud_chat,
-        prompt, ai_config["endpoint"],
-        ai_config["api_key"], ai_config["model"],
-    )
     try:
-        raw = future.result(timeout=_AI_TIMEOUT)
+        raw = _call_with_timeout(
+            cloud_chat,
+            prompt, ai_config["endpoint"],
+            ai_config["api_key"], ai_config["model"],
+        )
     except TimeoutError:
-        future.cancel()
-        pool.shutdown(wait=False, cancel_futures=True)
         return None
-    pool.shutdown(wait=False)
     raw = _strip_think_tags(raw)
     if not raw or len(raw) < 10:
         return ("Could not generate summary", "")
@@ -159,19 +204,14 @@ def _summarize_with_ai(
         return _summarize_with_cloud(node, ai_config)
 
     prompt = _build_prompt(node, model)
-    pool = ThreadPoolExecutor(max_workers=1)
-    future = pool.submit(
-        ollama.chat,
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-    )
     try:
-        response = future.result(timeout=_AI_TIMEOUT)
+        response = _call_with_timeout(
+            ollama.chat,
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+        )
     except TimeoutError:
-        future.cancel()
-        pool.shutdown(wait=False, cancel_futures=True)
         return None
-    pool.shutdown(wait=False)
     msg = getattr(response, "message", None)
     if msg is None:
         raise ValueError("Unexpected Ollama response format")
@@ -205,36 +245,77 @@ def _cache_key(node: CodeNode) -> str:
     return f"{node.filepath}::{node.name}::{source_hash}"
 
 
+def _legacy_cache_path(path: str) -> str | None:
+    """Return the pre-gzip cache path for *path*, if it has one."""
+    if path.endswith(_LEGACY_CACHE_SUFFIX):
+        return path[:-len(_LEGACY_CACHE_SUFFIX)]
+    return None
+
+
+def _read_cache_bytes(path: str) -> bytes:
+    """Read *path*, falling back to its legacy plain-JSON name."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        legacy = _legacy_cache_path(path)
+        if legacy is None:
+            raise
+        with open(legacy, "rb") as f:
+            return f.read()
+
+
 def _load_cache(path: str) -> dict:
-    """Load cache from JSON file."""
+    """Load cache from a gzipped (or legacy plain) JSON file."""
     try:
-        with open(path, encoding="utf-8") as f:
-            data = json.load(f)
+        raw = _read_cache_bytes(path)
+        if raw[:2] == _GZIP_MAGIC:
+            raw = gzip.decompress(raw)
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
         if isinstance(data, dict) and data.get("version") == 1:
             return data
-    except (FileNotFoundError, json.JSONDecodeError, OSError):
+    except (FileNotFoundError, ValueError, OSError, EOFError, zlib.error):
         pass
     return {"version": 1, "model": "", "entries": {}}
 
 
+def _dump_cache(data: dict) -> bytes:
+    """Serialize cache *data* to gzipped JSON bytes.
+
+    Uses orjson when available.  Level 1 compression is nearly free and
+    still shrinks the repetitive summary text several-fold.
+    """
+    if orjson is not None:
+        raw = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        raw = json.dumps(data).encode("utf-8")
+    return gzip.compress(raw, compresslevel=1, mtime=0)
+
+
 def _save_cache(path: str, data: dict) -> None:
-    """Save cache to JSON file atomically."""
+    """Save cache to a gzipped JSON file atomically."""
     parent = os.path.dirname(os.path.abspath(path))
     tmp_path: str | None = None
     try:
         fd = tempfile.NamedTemporaryFile(  # pylint: disable=consider-using-with  # noqa: E501
-            mode="w", encoding="utf-8",
-            dir=parent, delete=False, suffix=".tmp",
+            mode="wb", dir=parent, delete=False, suffix=".tmp",
         )
         tmp_path = fd.name
         try:
-            json.dump(data, fd, indent=2)
+            fd.write(_dump_cache(data))
             fd.flush()
             os.fsync(fd.fileno())
         finally:
             fd.close()
         os.replace(tmp_path, path)
         tmp_path = None  # success — don't clean up
+        # The new file supersedes a migrated legacy cache
+        legacy = _legacy_cache_path(path)
+        if legacy is not None:
+            try:
+                os.unlink(legacy)
+            except OSError:
+                pass
     except OSError as e:
         print(
             f"Warning: could not save cache: {e}",
@@ -253,6 +334,12 @@ def _save_cache(path: str, data: dict) -> None:
 # ---------------------------------------------------------------------------
 
 
+@functools.lru_cache(maxsize=8192)
+def _path_node_id(key: str) -> str:
+    """Return the 12-char hex node_id for a tree path key (memoized)."""
+    return hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+
 def assign_node_ids(root: CodeNode) -> dict[str, CodeNode]:
     """Walk tree, assign a unique 12-char hex node_id to every node.
 
@@ -260,16 +347,14 @@ def assign_node_ids(root: CodeNode) -> dict[str, CodeNode]:
     """
     lookup: dict[str, CodeNode] = {}
 
-    def _walk(node: CodeNode, path_parts: list[str]) -> None:
-        key = "::".join(path_parts)
-        node_id = _md5(key.encode()).hexdigest()[:12]
+    def _walk(node: CodeNode, key: str) -> None:
+        node_id = _path_node_id(key)
         node.node_id = node_id
         lookup[node_id] = node
         for child in node.children:
-            child_parts = path_parts + [child.node_type, child.name]
-            _walk(child, child_parts)
+            _walk(child, f"{key}::{child.node_type}::{child.name}")
 
-    _walk(root, [root.name])
+    _walk(root, root.name)
     return lookup
 
 
@@ -347,10 +432,16 @@ def analyze_single_node(  # pylint: disable=too-many-locals
 def _collect_nodes(
     node: CodeNode, depth: int = 0,
 ) -> list[tuple[CodeNode, int]]:
-    """Collect all nodes with their depth for priority batching."""
-    result = [(node, depth)]
-    for child in node.children:
-        result.extend(_collect_nodes(child, depth + 1))
+    """Collect all nodes (pre-order) with their depth for priority batching.
+
+    Uses an explicit stack so deep trees can't hit the recursion limit.
+    """
+    result: list[tuple[CodeNode, int]] = []
+    stack = [(node, depth)]
+    while stack:
+        current, d = stack.pop()
+        result.append((current, d))
+        stack.extend((c, d + 1) for c in reversed(current.children))
     return result
 
 
@@ -390,12 +481,17 @@ def _select_ai_nodes(
 
 
 def _dispatch_work(func, nodes: list[CodeNode], workers: int) -> None:
-    """Run *func* on each node, serially or in parallel."""
-    if workers == 1:
+    """Run *func* on each node, serially or in parallel.
+
+    The pool is bounded by the number of nodes so small trees don't
+    spin up idle threads.
+    """
+    pool_size = min(workers, len(nodes))
+    if pool_size <= 1:
         for node in nodes:
             func(node)
     else:
-        with ThreadPoolExecutor(max_workers=workers) as pool:
+        with ThreadPoolExecutor(max_workers=pool_size) as pool:
             futs = {pool.submit(func, n): n for n in nodes}
             for future in as_completed(futs):
                 exc = future.exception()
@@ -420,10 +516,6 @@ def _run_ai_batch(
             print(f"[{counter[0]}/{total}] {label}...", file=sys.stderr)
 
     def _do_one(node: CodeNode) -> None:
-        if node.line_count < MIN_LINES_FOR_AI:
-            node.summary = f"Small {node.node_type} ({node.line_count} lines)"
-            _progress(f"Skipping small {node.name}")
-            return
         key = _cache_key(node)
         with cache_lock:
             if key in cache["entries"]:
@@ -451,7 +543,13 @@ def _run_ai_batch(
             print(f"  AI error for {node.name}: {e}", file=sys.stderr)
 
     ai_nodes = _select_ai_nodes(all_nodes)
-    _dispatch_work(_do_one, ai_nodes, workers)
+    # Small nodes never reach the AI, so label them before dispatching
+    small = [n for n in ai_nodes if n.line_count < MIN_LINES_FOR_AI]
+    normal = [n for n in ai_nodes if n.line_count >= MIN_LINES_FOR_AI]
+    for node in small:
+        node.summary = f"Small {node.node_type} ({node.line_count} lines)"
+        _progress(f"Skipping small {node.name}")
+    _dispatch_work(_do_one, normal, workers)
     return len(ai_nodes)
 
 
@@ -543,26 +641,20 @@ def analyze(
 
 def analyze_no_ai(root: CodeNode) -> CodeNode:
     """Analyze with quality scoring only — no ollama calls."""
-    total = _count_nodes(root)
-    counter = [0]
+    all_nodes = _collect_nodes(root)
+    total = len(all_nodes)
 
-    def _walk(node: CodeNode) -> None:
-        counter[0] += 1
-        idx = counter[0]
+    for idx, (node, _depth) in enumerate(all_nodes, 1):
         print(f"[{idx}/{total}] Scoring {node.name}...", file=sys.stderr)
-
         quality, warnings = _score_quality(node)
         node.quality = quality
         node.warnings = warnings
 
-        for child in node.children:
-            _walk(child)
-
+    # Reversed pre-order visits every child before its parent
+    for node, _depth in reversed(all_nodes):
         if node.node_type in ("file", "class"):
             _rollup_quality(node)
-
         if node.node_type == "directory":
             _summarize_directory(node)
 
-    _walk(root)
     return root
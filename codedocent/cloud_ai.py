@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import functools
 import ipaddress
 import json
 import socket
@@ -80,11 +81,12 @@ class _MaskedSecret:
         return bool(self._value)
 
 
-def _validate_endpoint(endpoint: str) -> str:
-    """Validate and return the endpoint URL.
+@functools.lru_cache(maxsize=16)
+def _parse_endpoint(endpoint: str) -> tuple[str, str]:
+    """Return ``(scheme, hostname)`` for *endpoint*.
 
-    Raises ``ValueError`` for invalid URLs or non-HTTPS endpoints
-    (except localhost/127.0.0.1).
+    Raises ``ValueError`` for non-HTTP(S) schemes or a missing hostname.
+    Pure string parsing, so successful results are memoized.
     """
     parsed = urllib.parse.urlparse(endpoint)
     if parsed.scheme not in ("http", "https"):
@@ -93,10 +95,22 @@ def _validate_endpoint(endpoint: str) -> str:
         )
     if not parsed.hostname:
         raise ValueError("Invalid URL: missing hostname")
-    if parsed.scheme == "http":
+    return parsed.scheme, parsed.hostname
+
+
+def _validate_endpoint(endpoint: str) -> str:
+    """Validate and return the endpoint URL.
+
+    Raises ``ValueError`` for invalid URLs or non-HTTPS endpoints
+    (except localhost/127.0.0.1).  HTTP hostnames are re-resolved on
+    every call, so a name that stops pointing at loopback is caught
+    before the API key is sent.
+    """
+    scheme, hostname = _parse_endpoint(endpoint)
+    if scheme == "http":
         try:
             addr_info = socket.getaddrinfo(
-                parsed.hostname, None, proto=socket.IPPROTO_TCP,
+                hostname, None, proto=socket.IPPROTO_TCP,
             )
             resolved_ip = addr_info[0][4][0]
             if not ipaddress.ip_address(resolved_ip).is_loopback:
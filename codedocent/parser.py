@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import os
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -11,7 +12,7 @@ import tree_sitter_language_pack as tslp
 from codedocent.scanner import ScannedFile
 
 
-@dataclass
+@dataclass(slots=True)
 class CodeNode:  # pylint: disable=too-many-instance-attributes
     """Represents a node in the parsed code tree."""
 
@@ -32,6 +33,12 @@ class CodeNode:  # pylint: disable=too-many-instance-attributes
     warnings: list[str] | None = None
     node_id: str | None = None
 
+    def __post_init__(self) -> None:
+        # Trees repeat a handful of type/language labels thousands of times
+        self.node_type = sys.intern(self.node_type)
+        if self.language is not None:
+            self.language = sys.intern(self.language)
+
 
 # ---------------------------------------------------------------------------
 # Language-specific AST extraction rules
@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+import ast
+import functools
+
 from codedocent.parser import CodeNode
 
 PARAM_THRESHOLD = 5
@@ -60,41 +63,110 @@ def _worst_quality(a: str, b: str) -> str:
     return a if order.get(a, 0) >= order.get(b, 0) else b
 
 
+def _python_param_count(
+    func: ast.FunctionDef | ast.AsyncFunctionDef,
+) -> int:
+    """Count parameters the same way the tree-sitter path does.
+
+    Bare ``*`` and ``/`` separators count as entries, while a plain
+    ``self``/``cls`` (no annotation or default) is skipped.
+    """
+    args = func.args
+    positional = args.posonlyargs + args.args
+    first_default = len(positional) - len(args.defaults)
+    count = 0
+    for i, arg in enumerate(positional):
+        if (
+            arg.arg in ("self", "cls") and arg.annotation is None
+            and i < first_default
+        ):
+            continue
+        count += 1
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        if (
+            arg.arg in ("self", "cls") and arg.annotation is None
+            and default is None
+        ):
+            continue
+        count += 1
+    count += args.vararg is not None
+    count += args.kwarg is not None
+    count += bool(args.posonlyargs)  # "/" separator
+    count += bool(args.kwonlyargs) and args.vararg is None  # bare "*"
+    return count
+
+
+@functools.lru_cache(maxsize=512)
+def _python_metrics(source: str) -> tuple[int | None, int | None]:
+    """Parse Python *source* once and return (worst complexity, params).
+
+    Either value is ``None`` when it cannot be determined: unparseable
+    code, radon not installed, no blocks, or no leading function.
+    Memoized, so re-scoring identical code skips the parse entirely.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None, None
+
+    worst = None
+    try:
+        from radon.complexity import cc_visit_ast  # type: ignore[import-untyped]  # pylint: disable=import-outside-toplevel  # noqa: E501
+
+        worst = max(
+            (b.complexity for b in cc_visit_ast(tree)), default=None,
+        )
+    except (ImportError, AttributeError):  # nosec B110
+        pass
+
+    params = None
+    if tree.body and isinstance(
+        tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef),
+    ):
+        params = _python_param_count(tree.body[0])
+    return worst, params
+
+
 def _score_radon(node: CodeNode) -> tuple[str, str | None]:
     """Score cyclomatic complexity via radon (Python only)."""
     if node.language != "python" or not node.source:
         return "clean", None
 
-    try:
-        from radon.complexity import cc_visit, cc_rank  # type: ignore[import-untyped]  # pylint: disable=import-outside-toplevel  # noqa: E501
-
-        blocks = cc_visit(node.source)
-        if blocks:
-            worst = max(b.complexity for b in blocks)
-            rank = cc_rank(worst)
-            if rank in ("A", "B", "C"):
-                return "clean", None
-            if rank == "D":
-                return (
-                    "complex",
-                    f"High complexity (grade {rank},"
-                    f" score {worst})",
-                )
-            return (
-                "warning",
-                f"Severe complexity (grade {rank},"
-                f" score {worst})",
-            )
-    except (ImportError, AttributeError, SyntaxError):  # nosec B110
-        pass
+    worst, _params = _python_metrics(node.source)
+    if worst is None:
+        return "clean", None
 
-    return "clean", None
+    from radon.complexity import cc_rank  # type: ignore[import-untyped]  # pylint: disable=import-outside-toplevel  # noqa: E501
+
+    rank = cc_rank(worst)
+    if rank in ("A", "B", "C"):
+        return "clean", None
+    if rank == "D":
+        return (
+            "complex",
+            f"High complexity (grade {rank},"
+            f" score {worst})",
+        )
+    return (
+        "warning",
+        f"Severe complexity (grade {rank},"
+        f" score {worst})",
+    )
 
 
 def _score_param_count(node: CodeNode) -> tuple[str, str | None]:
-    """Score based on parameter count."""
+    """Score based on parameter count.
+
+    Python reuses the AST already parsed for complexity scoring; other
+    languages (and unparseable Python) fall back to tree-sitter.
+    """
     if node.node_type in ("function", "method"):
-        if _count_parameters(node) > PARAM_THRESHOLD:
+        params = None
+        if node.language == "python" and node.source:
+            _worst, params = _python_metrics(node.source)
+        if params is None:
+            params = _count_parameters(node)
+        if params > PARAM_THRESHOLD:
             return "complex", "Many parameters: consider grouping"
     return "clean", None
 
@@ -183,16 +255,21 @@ def _summarize_directory(node: CodeNode) -> None:
     if node.node_type != "directory":
         return
 
-    file_children = [c for c in node.children if c.node_type == "file"]
-    dir_children = [c for c in node.children if c.node_type == "directory"]
+    file_names: list[str] = []
+    dir_names: list[str] = []
+    for child in node.children:
+        if child.node_type == "file":
+            file_names.append(child.name)
+        elif child.node_type == "directory":
+            dir_names.append(child.name)
 
     parts: list[str] = []
-    if file_children:
-        names = ", ".join(c.name for c in file_children)
-        parts.append(f"{len(file_children)} files: {names}")
-    if dir_children:
-        names = ", ".join(c.name for c in dir_children)
-        parts.append(f"{len(dir_children)} directories: {names}")
+    if file_names:
+        parts.append(f"{len(file_names)} files: {', '.join(file_names)}")
+    if dir_names:
+        parts.append(
+            f"{len(dir_names)} directories: {', '.join(dir_names)}",
+        )
 
     node.summary = (
         f"Contains {'; '.join(parts)}" if parts else "Empty directory"
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import os
+from collections.abc import Iterator
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -93,6 +94,32 @@ def _should_skip_dir(dirname: str) -> bool:
     return False
 
 
+def _iter_source_entries(root: str) -> Iterator[os.DirEntry]:
+    """Yield regular, non-symlink files under *root*, pruning skip dirs.
+
+    Uses ``os.scandir`` so file-type checks come from the directory
+    listing itself instead of an extra ``stat`` per entry.
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_symlink():
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if (
+                    not _should_skip_dir(entry.name)
+                    and not entry.name.startswith(".")
+                ):
+                    stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
 def scan_directory(path: str | Path) -> list[ScannedFile]:
     """Walk a directory and return all recognized source files.
 
@@ -103,41 +130,26 @@ def scan_directory(path: str | Path) -> list[ScannedFile]:
     gitignore = _load_gitignore(root)
     results: list[ScannedFile] = []
 
-    for dirpath, dirnames, filenames in os.walk(root):
-        # Filter out directories we should skip (in-place prunes walk)
-        dirnames[:] = [
-            d for d in dirnames
-            if not _should_skip_dir(d)
-            and not d.startswith(".")
-            and not os.path.islink(os.path.join(dirpath, d))
-        ]
-        dirnames.sort()
-
-        for filename in filenames:
-            filepath = os.path.join(dirpath, filename)
-            if os.path.islink(filepath):
-                continue
-            if not os.path.isfile(filepath):
-                continue
-            rel_path = os.path.relpath(filepath, root)
+    for entry in _iter_source_entries(root):
+        ext = os.path.splitext(entry.name)[1].lower()
+        language = EXTENSION_MAP.get(ext)
+        if language is None:
+            continue
 
-            # Skip gitignore'd files
-            if gitignore and gitignore.match_file(rel_path):
-                continue
+        rel_path = os.path.relpath(entry.path, root)
 
-            ext = os.path.splitext(filename)[1].lower()
-            language = EXTENSION_MAP.get(ext)
-            if language is None:
-                continue
+        # Skip gitignore'd files
+        if gitignore and gitignore.match_file(rel_path):
+            continue
 
-            if _is_binary(filepath):
-                continue
+        if _is_binary(entry.path):
+            continue
 
-            results.append(ScannedFile(
-                filepath=rel_path,
-                language=language,
-                extension=ext,
-            ))
+        results.append(ScannedFile(
+            filepath=rel_path,
+            language=language,
+            extension=ext,
+        ))
 
     results.sort(key=lambda f: f.filepath)
     return results
@@ -12,60 +12,88 @@ import sys
 import threading
 import time
 import webbrowser
+from collections.abc import Callable
 from http.server import BaseHTTPRequestHandler
 
 from codedocent.parser import CodeNode
 from codedocent.renderer import LANGUAGE_COLORS, DEFAULT_COLOR, NODE_ICONS
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
 
 IDLE_TIMEOUT = 300  # 5 minutes
 IDLE_CHECK_INTERVAL = 30  # seconds
 MAX_BODY_SIZE = 10 * 1024 * 1024  # 10 MB
+MAX_REPLACE_SIZE = 1_000_000  # bytes of UTF-8 replacement source
 _TEMPLATES_DIR = os.path.realpath(
     os.path.join(os.path.dirname(__file__), "templates"),
 )
+_TEMPLATES_PREFIX = _TEMPLATES_DIR + os.sep
+
+
+def _dumps_json(obj: dict) -> bytes:
+    """Serialize *obj* to UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _loads_json(raw: bytes):
+    """Parse JSON *raw* bytes, using orjson when available.
+
+    Raises ``ValueError`` (which both decoders' errors subclass) on
+    malformed input.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 def _node_to_dict(node: CodeNode, include_source: bool = False) -> dict:
     """Serialize a CodeNode to a JSON-safe dict.
 
     Excludes ``source`` by default (too large for page load).
-    Recursively includes children.
+    Includes children, walking the tree with an explicit stack so deep
+    trees cannot hit the recursion limit.
     """
-    d: dict = {
-        "name": node.name,
-        "node_type": node.node_type,
-        "language": node.language,
-        "filepath": node.filepath,
-        "start_line": node.start_line,
-        "end_line": node.end_line,
-        "line_count": node.line_count,
-        "node_id": node.node_id,
-        "imports": node.imports,
-        "summary": node.summary,
-        "pseudocode": node.pseudocode,
-        "quality": node.quality,
-        "warnings": node.warnings,
-        "color": (
-            LANGUAGE_COLORS.get(node.language, DEFAULT_COLOR)
-            if node.language else DEFAULT_COLOR
-        ),
-        "icon": NODE_ICONS.get(node.node_type, ""),
-        "children": [
-            _node_to_dict(c, include_source=include_source)
-            for c in node.children
-        ],
-    }
-    if include_source:
-        d["source"] = node.source
-    return d
-
-
-def _find_open_port() -> int:
-    """Ask the OS for a free port."""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("127.0.0.1", 0))
-        return s.getsockname()[1]
+    # Each entry is a node plus the preallocated slot its dict fills, so
+    # children keep source order however the stack is drained
+    top: list = [None]
+    stack: list[tuple[CodeNode, list, int]] = [(node, top, 0)]
+    while stack:
+        current, siblings, index = stack.pop()
+        children: list = [None] * len(current.children)
+        d = {
+            "name": current.name,
+            "node_type": current.node_type,
+            "language": current.language,
+            "filepath": current.filepath,
+            "start_line": current.start_line,
+            "end_line": current.end_line,
+            "line_count": current.line_count,
+            "node_id": current.node_id,
+            "imports": current.imports,
+            "summary": current.summary,
+            "pseudocode": current.pseudocode,
+            "quality": current.quality,
+            "warnings": current.warnings,
+            "color": (
+                LANGUAGE_COLORS.get(current.language, DEFAULT_COLOR)
+                if current.language else DEFAULT_COLOR
+            ),
+            "icon": NODE_ICONS.get(current.node_type, ""),
+            "children": children,
+        }
+        if include_source:
+            d["source"] = current.source
+        siblings[index] = d
+        stack.extend(
+            (child, children, i) for i, child in enumerate(current.children)
+        )
+    return top[0]
 
 
 def _resolve_filepath(node: CodeNode, cache_dir: str) -> str:
@@ -76,6 +104,13 @@ def _resolve_filepath(node: CodeNode, cache_dir: str) -> str:
     return os.path.join(cache_dir, filepath)
 
 
+def _invalidate_tree_cache() -> None:
+    """Drop the serialized ``/api/tree`` body after the tree changes."""
+    with _Handler.tree_lock:
+        _Handler.tree_version += 1
+        _Handler.tree_cache = None
+
+
 def _update_node_after_replace(
     node: CodeNode, new_source: str, result: dict, cache_dir: str,
 ) -> None:
@@ -100,6 +135,7 @@ def _update_node_after_replace(
     cache = _load_cache(cache_path)
     cache.get("entries", {}).pop(old_key, None)
     _save_cache(cache_path, cache)
+    _invalidate_tree_cache()
 
 
 def _refresh_file_nodes(node: CodeNode) -> None:
@@ -129,6 +165,7 @@ def _refresh_file_nodes(node: CodeNode) -> None:
     # Rebuild the full node_lookup (IDs are deterministic, so unchanged
     # nodes keep their IDs; the browser's existing references stay valid)
     _Handler.node_lookup = assign_node_ids(_Handler.root)
+    _invalidate_tree_cache()
 
 
 def _start_idle_watcher(
@@ -170,6 +207,7 @@ def _analyze_node(node_id: str) -> dict | None:
                     file=sys.stderr, flush=True,
                 )
                 node.summary = "Analysis failed"
+            _invalidate_tree_cache()
     return _node_to_dict(node, include_source=True)
 
 
@@ -192,16 +230,21 @@ def _execute_replace(  # pylint: disable=too-many-return-statements
     new_source = body.get("source", "")
     if not isinstance(new_source, str):
         return (400, {"success": False, "error": "source must be a string"})
-    if len(new_source.encode("utf-8")) > 1_000_000:
+    # Each char encodes to 1-4 UTF-8 bytes, so only encode when the
+    # character count alone can't decide
+    if len(new_source) > MAX_REPLACE_SIZE or (
+        len(new_source) * 4 > MAX_REPLACE_SIZE
+        and len(new_source.encode("utf-8")) > MAX_REPLACE_SIZE
+    ):
         return (
             400,
             {"success": False, "error": "Replacement too large (max 1MB)"},
         )
     abs_path = _resolve_filepath(node, _Handler.cache_dir)
     real_path = os.path.realpath(abs_path)
-    real_root = os.path.realpath(_Handler.cache_dir)
+    real_root = _Handler.real_root
     if real_path == _TEMPLATES_DIR or real_path.startswith(
-        _TEMPLATES_DIR + os.sep,
+        _TEMPLATES_PREFIX,
     ):
         return (
             400,
@@ -254,21 +297,54 @@ def _execute_replace(  # pylint: disable=too-many-return-statements
 class _Handler(BaseHTTPRequestHandler):
     """HTTP request handler for codedocent server."""
 
+    # Keep-alive: every response carries Content-Length
+    protocol_version = "HTTP/1.1"
+    # Per request: whether the client itself asked to close the connection
+    client_close: bool = False
+    # Socket timeout; an idle kept-alive connection gives up its handler
+    # thread after this many seconds, as does a stalled body read
+    timeout = 30
+
     # Class-level shared state, set by start_server() before serving
-    html_content: str = ""
+    # Rendered page, encoded once at startup
+    html_content: bytes = b""
     csrf_token: str = ""
     root: CodeNode | None = None
     node_lookup: dict[str, CodeNode] = {}
     model: str = ""
     cache_dir: str = "."
+    # cache_dir resolved once per server session for the escape check
+    real_root: str = ""
     ai_config: dict | None = None
     analyze_lock: threading.Lock = threading.Lock()
     last_request_time: list[float] = [0.0]
     server_ref: socketserver.TCPServer | None = None
+    # Serialized /api/tree body; tree_version guards against caching a
+    # body built from a tree that changed mid-serialization
+    tree_cache: bytes | None = None
+    tree_version: int = 0
+    tree_lock: threading.Lock = threading.Lock()
+
+    # Method names by exact path, and by "/api/<name>/" prefix for
+    # endpoints that take the remainder of the path as a node ID
+    _GET_ROUTES: dict[str, str] = {"/api/tree": "_serve_tree"}
+    _GET_ID_ROUTES: dict[str, str] = {"/api/source/": "_handle_source"}
+    _POST_ROUTES: dict[str, str] = {"/shutdown": "_handle_shutdown"}
+    _POST_ID_ROUTES: dict[str, str] = {
+        "/api/analyze/": "_handle_analyze",
+        "/api/replace/": "_handle_replace",
+    }
 
     def log_message(self, format, *args):  # pylint: disable=redefined-builtin  # noqa: A002,E501
         pass  # silence default logging
 
+    def handle(self):
+        """Serve requests until the client closes the kept-alive connection."""
+        try:
+            super().handle()
+        except ConnectionResetError:
+            pass  # client dropped the connection between requests
+
     def _touch(self):
         _Handler.last_request_time[0] = time.time()
 
@@ -281,9 +357,22 @@ class _Handler(BaseHTTPRequestHandler):
             return False
         return True
 
+    def _begin_request(self):
+        """Bookkeeping shared by every request before dispatch.
+
+        Unread body bytes would be parsed as the next request on a
+        kept-alive connection, so close it unless a handler reads them.
+        """
+        self._touch()
+        self.client_close = self.close_connection
+        length = self.headers.get("Content-Length")
+        if ("Transfer-Encoding" in self.headers
+                or (length is not None and length.strip() != "0")):
+            self.close_connection = True
+
     def do_GET(self):  # pylint: disable=invalid-name
         """Handle GET requests."""
-        self._touch()
+        self._begin_request()
         if not self._check_host():
             return
         if self.path == "/":
@@ -295,38 +384,39 @@ class _Handler(BaseHTTPRequestHandler):
                     403, {"error": "Invalid or missing CSRF token"},
                 )
                 return
-            if self.path == "/api/tree":
-                self._serve_tree()
-            elif self.path.startswith("/api/source/"):
-                node_id = self.path[len("/api/source/"):]
-                self._handle_source(node_id)
-            else:
-                self.send_error(404)
+            self._dispatch(self._GET_ROUTES, self._GET_ID_ROUTES)
         else:
             self.send_error(404)
 
     def do_POST(self):  # pylint: disable=invalid-name
         """Handle POST requests."""
-        self._touch()
+        self._begin_request()
         if not self._check_host():
             return
         token = self.headers.get("X-Codedocent-Token", "")
         if token != _Handler.csrf_token:
             self._send_json(403, {"error": "Invalid or missing CSRF token"})
             return
-        if self.path == "/shutdown":
-            self._handle_shutdown()
-        elif self.path.startswith("/api/analyze/"):
-            node_id = self.path[len("/api/analyze/"):]
-            self._handle_analyze(node_id)
-        elif self.path.startswith("/api/replace/"):
-            node_id = self.path[len("/api/replace/"):]
-            self._handle_replace(node_id)
-        else:
-            self.send_error(404)
+        self._dispatch(self._POST_ROUTES, self._POST_ID_ROUTES)
+
+    def _dispatch(
+        self, routes: dict[str, str], id_routes: dict[str, str],
+    ) -> None:
+        """Call the handler method routed for ``self.path``, or send 404."""
+        name = routes.get(self.path)
+        if name is not None:
+            getattr(self, name)()
+            return
+        parts = self.path.split("/", 3)
+        if len(parts) == 4:
+            name = id_routes.get(f"/{parts[1]}/{parts[2]}/")
+            if name is not None:
+                getattr(self, name)(parts[3])
+                return
+        self.send_error(404)
 
     def _serve_html(self):
-        data = _Handler.html_content.encode("utf-8")
+        data = _Handler.html_content
         self.send_response(200)
         self.send_header("Content-Type", "text/html; charset=utf-8")
         self.send_header("Content-Length", str(len(data)))
@@ -334,7 +424,15 @@ class _Handler(BaseHTTPRequestHandler):
         self.wfile.write(data)
 
     def _serve_tree(self):
-        self._send_json(200, _node_to_dict(_Handler.root))
+        with _Handler.tree_lock:
+            data = _Handler.tree_cache
+            version = _Handler.tree_version
+        if data is None:
+            data = _dumps_json(_node_to_dict(_Handler.root))
+            with _Handler.tree_lock:
+                if version == _Handler.tree_version:
+                    _Handler.tree_cache = data
+        self._send_json_bytes(200, data)
 
     def _handle_source(self, node_id: str):
         with _Handler.analyze_lock:
@@ -373,7 +471,7 @@ class _Handler(BaseHTTPRequestHandler):
                       "error": "Request body too large"},
             )
             return
-        self.connection.settimeout(30)
+        # Bounded by the handler's socket timeout
         try:
             raw = self.rfile.read(content_length)
         except socket.timeout:
@@ -382,11 +480,11 @@ class _Handler(BaseHTTPRequestHandler):
                 {"success": False, "error": "Request body read timed out"},
             )
             return
-        finally:
-            self.connection.settimeout(None)
+        if len(raw) == content_length:
+            self.close_connection = self.client_close
         try:
-            body = json.loads(raw)
-        except (json.JSONDecodeError, ValueError):
+            body = _loads_json(raw)
+        except ValueError:
             self._send_json(400, {"success": False, "error": "Invalid JSON"})
             return
         try:
@@ -401,16 +499,21 @@ class _Handler(BaseHTTPRequestHandler):
         self._send_json(status, result)
 
     def _send_json(self, status_code: int, obj: dict):
-        data = json.dumps(obj).encode("utf-8")
+        self._send_json_bytes(status_code, _dumps_json(obj))
+
+    def _send_json_bytes(self, status_code: int, data: bytes):
         self.send_response(status_code)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
         self.end_headers()
         self.wfile.write(data)
 
     def _handle_shutdown(self):
         self.send_response(200)
         self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", "2")
         self.end_headers()
         self.wfile.write(b"OK")
         # Trigger shutdown in background thread
@@ -431,11 +534,13 @@ def _setup_handler_state(
     _Handler.csrf_token = secrets.token_urlsafe(32)
     _Handler.html_content = render_interactive(
         root, csrf_token=_Handler.csrf_token,
-    )
+    ).encode("utf-8")
     _Handler.root = root
     _Handler.node_lookup = node_lookup
+    _invalidate_tree_cache()
     _Handler.model = model
     _Handler.cache_dir = root.filepath or "."
+    _Handler.real_root = os.path.realpath(_Handler.cache_dir)
     _Handler.ai_config = ai_config
     _Handler.analyze_lock = threading.Lock()
     _Handler.last_request_time = [time.time()]
@@ -469,20 +574,22 @@ def start_server(  # pylint: disable=too-many-arguments
     open_browser: bool = True,
     *,
     ai_config: dict | None = None,
+    on_ready: Callable[[socketserver.TCPServer], object] | None = None,
 ) -> None:
     """Start the interactive server.
 
     Blocks until shutdown (POST /shutdown, idle timeout, or Ctrl-C).
+    *on_ready*, if given, is called with the listening server just before
+    it starts serving.
     """
-    if port is None:
-        port = _find_open_port()
-
     _setup_handler_state(root, node_lookup, model, ai_config=ai_config)
 
     server = socketserver.ThreadingTCPServer(
-        ("127.0.0.1", port), _Handler,
+        ("127.0.0.1", port or 0), _Handler,
     )
     server.daemon_threads = True
+    # No port (or 0) lets the OS pick while binding; report the one bound
+    port = server.server_address[1]
     _Handler.server_ref = server
 
     _start_idle_watcher(server, _Handler.last_request_time)
@@ -495,6 +602,9 @@ def start_server(  # pylint: disable=too-many-arguments
     if open_browser:
         webbrowser.open(url)
 
+    if on_ready is not None:
+        on_ready(server)
+
     try:
         server.serve_forever()
     finally:
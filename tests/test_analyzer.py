@@ -2,13 +2,21 @@
 
 from __future__ import annotations
 
+import copy
+import gzip
 import json
 import os
 import time
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
 from codedocent.parser import CodeNode
 
 
@@ -22,16 +30,20 @@ def _make_func_node(
     lang: str = "python",
     source: str = "def add(a, b):\n    return a + b\n",
 ) -> CodeNode:
-    lines = source.splitlines()
+    # Count lines without materializing them; an unterminated last line
+    # still counts
+    line_count = source.count("\n") + (
+        bool(source) and not source.endswith("\n")
+    )
     return CodeNode(
         name=name,
         node_type="function",
         language=lang,
         filepath="test.py",
         start_line=1,
-        end_line=len(lines),
+        end_line=line_count,
         source=source,
-        line_count=len(lines),
+        line_count=line_count,
     )
 
 
@@ -41,16 +53,20 @@ def _make_file_node(
     source: str = "x = 1\n",
     children: list[CodeNode] | None = None,
 ) -> CodeNode:
-    lines = source.splitlines()
+    # Count lines without materializing them; an unterminated last line
+    # still counts
+    line_count = source.count("\n") + (
+        bool(source) and not source.endswith("\n")
+    )
     return CodeNode(
         name=name,
         node_type="file",
         language=lang,
         filepath=name,
         start_line=1,
-        end_line=len(lines),
+        end_line=line_count,
         source=source,
-        line_count=len(lines),
+        line_count=line_count,
         children=children or [],
     )
 
@@ -101,6 +117,11 @@ def _make_tree() -> CodeNode:
     return _make_dir_node(name="src", children=[file_node])
 
 
+def _chat_response(content: str) -> SimpleNamespace:
+    """Build an ollama chat response carrying *content*."""
+    return SimpleNamespace(message=SimpleNamespace(content=content))
+
+
 # ---------------------------------------------------------------------------
 # Tests
 # ---------------------------------------------------------------------------
@@ -183,8 +204,7 @@ def test_directory_summary_no_ai():
 def test_cache_creates_file(mock_ollama, tmp_path):
     from codedocent.analyzer import analyze
 
-    mock_response = MagicMock()
-    mock_response.message.content = (
+    mock_response = _chat_response(
         "SUMMARY: Adds numbers.\nPSEUDOCODE:\nadd a and b"
     )
     mock_ollama.chat.return_value = mock_response
@@ -197,9 +217,9 @@ def test_cache_creates_file(mock_ollama, tmp_path):
 
     analyze(root, model="test-model")
 
-    cache_path = tmp_path / ".codedocent_cache.json"
+    cache_path = tmp_path / ".codedocent_cache.json.gz"
     assert cache_path.exists()
-    data = json.loads(cache_path.read_text())
+    data = _loads(gzip.decompress(cache_path.read_bytes()))
     assert data["version"] == 1
     assert data["model"] == "test-model"
     assert len(data["entries"]) > 0
@@ -209,8 +229,7 @@ def test_cache_creates_file(mock_ollama, tmp_path):
 def test_cache_prevents_duplicate_calls(mock_ollama, tmp_path):
     from codedocent.analyzer import analyze
 
-    mock_response = MagicMock()
-    mock_response.message.content = (
+    mock_response = _chat_response(
         "SUMMARY: Adds numbers.\nPSEUDOCODE:\nadd a and b"
     )
     mock_ollama.chat.return_value = mock_response
@@ -296,6 +315,7 @@ def test_assign_node_ids():
     from codedocent.analyzer import assign_node_ids
 
     tree = _make_tree()
+    pristine = copy.deepcopy(tree)
     lookup = assign_node_ids(tree)
 
     # All nodes should have IDs
@@ -309,8 +329,7 @@ def test_assign_node_ids():
         assert len(node_id) == 12
 
     # IDs should be deterministic
-    tree2 = _make_tree()
-    lookup2 = assign_node_ids(tree2)
+    lookup2 = assign_node_ids(pristine)
     assert set(lookup.keys()) == set(lookup2.keys())
 
 
@@ -318,8 +337,7 @@ def test_assign_node_ids():
 def test_analyze_single_node(mock_ollama, tmp_path):
     from codedocent.analyzer import analyze_single_node
 
-    mock_response = MagicMock()
-    mock_response.message.content = (
+    mock_response = _chat_response(
         "SUMMARY: Adds two numbers.\nPSEUDOCODE:\nadd a and b"
     )
     mock_ollama.chat.return_value = mock_response
@@ -335,12 +353,32 @@ def test_analyze_single_node(mock_ollama, tmp_path):
     mock_ollama.chat.assert_called_once()
 
 
+@patch("codedocent.analyzer.ollama")
+def test_analyze_parallel_workers(mock_ollama, tmp_path):
+    from codedocent.analyzer import analyze
+
+    mock_response = _chat_response(
+        "SUMMARY: Adds numbers.\nPSEUDOCODE:\nadd a and b"
+    )
+    mock_ollama.chat.return_value = mock_response
+
+    source = "def add(a, b):\n    result = a + b\n    return result\n"
+    nodes = [_make_func_node(name=f"add{i}", source=source) for i in range(4)]
+    for node in nodes:
+        node.filepath = str(tmp_path / "test.py")
+    root = _make_dir_node(name="proj", children=nodes, filepath=str(tmp_path))
+
+    analyze(root, model="test-model", workers=8)
+
+    assert mock_ollama.chat.call_count == 4
+    assert all(n.summary == "Adds numbers." for n in nodes)
+
+
 @patch("codedocent.analyzer.ollama")
 def test_skip_small_files_in_analyze(mock_ollama, tmp_path):
     from codedocent.analyzer import analyze
 
-    mock_response = MagicMock()
-    mock_response.message.content = (
+    mock_response = _chat_response(
         "SUMMARY: Something.\nPSEUDOCODE:\ndo something"
     )
     mock_ollama.chat.return_value = mock_response
@@ -369,8 +407,7 @@ def test_garbage_response_fallback(mock_ollama, tmp_path):
     from codedocent.analyzer import analyze
 
     # Return garbage (too short after stripping)
-    mock_response = MagicMock()
-    mock_response.message.content = "<think>long thoughts</think>hi"
+    mock_response = _chat_response("<think>long thoughts</think>hi")
     mock_ollama.chat.return_value = mock_response
 
     node = _make_func_node(
@@ -498,14 +535,71 @@ def test_save_cache_atomic(tmp_path):
     _save_cache(cache_path, data)
 
     assert os.path.isfile(cache_path)
-    with open(cache_path, encoding="utf-8") as f:
-        loaded = json.load(f)
+    with open(cache_path, "rb") as f:
+        loaded = json.loads(gzip.decompress(f.read()))
     assert loaded == data
 
-    tmp_files = [f for f in os.listdir(str(tmp_path)) if f.endswith(".tmp")]
+    tmp_files = [e.name for e in os.scandir(tmp_path) if e.name.endswith(".tmp")]
     assert tmp_files == []
 
 
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dump_load_cache_round_trip(tmp_path, use_orjson):
+    """Cache bytes round-trip with orjson and with the stdlib fallback."""
+    import codedocent.analyzer as analyzer_mod
+    from codedocent.analyzer import _dump_cache, _load_cache
+
+    impl = analyzer_mod.orjson if use_orjson else None
+    if use_orjson and impl is None:
+        pytest.skip("orjson not installed")
+    data = {"version": 1, "model": "m", "entries": {"k": {"summary": "é"}}}
+    cache_path = tmp_path / "cache.json.gz"
+    with patch("codedocent.analyzer.orjson", impl):
+        cache_path.write_bytes(_dump_cache(data))
+        assert _load_cache(str(cache_path)) == data
+
+
+def test_load_cache_reads_legacy_plain_json(tmp_path):
+    """Caches written before gzip compression still load."""
+    from codedocent.analyzer import _load_cache
+
+    data = {"version": 1, "model": "test", "entries": {"k": {"summary": "s"}}}
+    cache_path = tmp_path / "cache.json"
+    cache_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+    assert _load_cache(str(cache_path)) == data
+
+
+def test_legacy_cache_file_migrated_once(tmp_path):
+    """A pre-gzip .json cache is read when no .json.gz exists, then
+    removed once the compressed cache is saved."""
+    from codedocent.analyzer import CACHE_FILENAME, _load_cache, _save_cache
+
+    data = {"version": 1, "model": "test", "entries": {"k": {"summary": "s"}}}
+    legacy = tmp_path / ".codedocent_cache.json"
+    legacy.write_text(json.dumps(data), encoding="utf-8")
+    cache_path = tmp_path / CACHE_FILENAME
+
+    assert _load_cache(str(cache_path)) == data
+    _save_cache(str(cache_path), data)
+    assert not legacy.exists()
+    assert gzip.decompress(cache_path.read_bytes())
+    assert _load_cache(str(cache_path)) == data
+
+
+def test_load_cache_corrupt_returns_empty(tmp_path):
+    """Corrupt, truncated, or non-UTF-8 cache files load as empty."""
+    from codedocent.analyzer import _load_cache
+
+    cache_path = tmp_path / "cache.json"
+    bad_gzip = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff" + b"\xff" * 20
+    for raw in (b"{not json", b"\xff\xfe\x00garbage", b"\x1f\x8bjunk", bad_gzip):
+        cache_path.write_bytes(raw)
+        assert _load_cache(str(cache_path)) == {
+            "version": 1, "model": "", "entries": {},
+        }
+
+
 def test_radon_syntax_error_returns_clean():
     """Fix 12: syntactically invalid Python doesn't crash _score_quality."""
     from codedocent.quality import _score_quality
@@ -518,6 +612,32 @@ def test_radon_syntax_error_returns_clean():
     assert quality == "clean"
 
 
+def test_quality_parses_python_once():
+    """Complexity and parameter scoring share one memoized AST parse."""
+    import ast
+
+    from codedocent.quality import _python_metrics, _score_quality
+
+    _python_metrics.cache_clear()
+    node = _make_func_node(source="def add(a, b):\n    return a + b\n")
+    with patch("codedocent.quality.ast.parse", wraps=ast.parse) as spy:
+        assert _score_quality(node) == ("clean", None)
+        assert _score_quality(node) == ("clean", None)
+    assert spy.call_count == 1
+
+
+def test_cache_key_follows_source_content():
+    """Equal sources share a cache key and edits get a new one."""
+    from codedocent.analyzer import _cache_key
+
+    node = _make_func_node(source="def add(a, b):\n    return a + b\n")
+    first = _cache_key(node)
+    assert _cache_key(_make_func_node()) == first
+
+    node.source = "def add(a, b):\n    return b + a\n"
+    assert _cache_key(node) != first
+
+
 # ---------------------------------------------------------------------------
 # Security fixes: replace endpoint guards
 # ---------------------------------------------------------------------------
@@ -538,6 +658,21 @@ def test_replace_rejects_oversized_payload():
     assert "too large" in result["error"]
 
 
+def test_replace_rejects_oversized_multibyte_payload():
+    """Fix 1: size limit counts UTF-8 bytes, not characters."""
+    from codedocent.server import _execute_replace, _Handler
+
+    node = _make_func_node(name="target", source="def target():\n    pass\n")
+    node.node_id = "test_node_001"
+    _Handler.node_lookup = {"test_node_001": node}
+    _Handler.cache_dir = "/tmp/test_proj"
+
+    giant = "\u20ac" * 350_000  # 3 bytes each: ~1.05 MB
+    status, result = _execute_replace("test_node_001", {"source": giant})
+    assert status == 400
+    assert "too large" in result["error"]
+
+
 def test_replace_rejects_template_filepath():
     """Fix 3: files inside codedocent's templates dir are rejected."""
     from codedocent.server import _execute_replace, _Handler, _TEMPLATES_DIR
@@ -572,6 +707,7 @@ def test_replace_accepts_file_node(tmp_path):
     node.node_id = "file_node_001"
     _Handler.node_lookup = {"file_node_001": node}
     _Handler.cache_dir = str(tmp_path)
+    _Handler.real_root = os.path.realpath(tmp_path)
     _Handler.root = _make_dir_node(
         name="proj", children=[node], filepath=str(tmp_path),
     )
@@ -684,8 +820,7 @@ def test_ollama_still_works_with_none_ai_config(mock_ollama, tmp_path):
     """Existing ollama tests still work when ai_config is None."""
     from codedocent.analyzer import analyze
 
-    mock_response = MagicMock()
-    mock_response.message.content = (
+    mock_response = _chat_response(
         "SUMMARY: Adds numbers.\nPSEUDOCODE:\nadd a and b"
     )
     mock_ollama.chat.return_value = mock_response
@@ -3,19 +3,37 @@
 from __future__ import annotations
 
 import argparse
-import json
 import os
-from unittest.mock import patch, MagicMock
+import subprocess  # nosec B404
+import sys
+from unittest.mock import patch
 
 import pytest
 
-from codedocent.cli import (
-    _check_ollama,
-    _fetch_ollama_models,
-    _run_wizard,
-    _build_arg_parser,
-    _build_ai_config,
-)
+
+@pytest.fixture(scope="session")
+def cli_mod():
+    """Import codedocent.cli once, on first use rather than at collection."""
+    import codedocent.cli  # pylint: disable=import-outside-toplevel
+    return codedocent.cli
+
+
+class _FakeResponse:
+    """Minimal stand-in for the context manager ``urlopen`` returns."""
+
+    __slots__ = ("_body",)
+
+    def __init__(self, body: bytes = b"") -> None:
+        self._body = body
+
+    def read(self, _amt: int | None = None) -> bytes:
+        return self._body
+
+    def __enter__(self) -> _FakeResponse:
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
 
 
 # ---------------------------------------------------------------------------
@@ -23,19 +41,20 @@ from codedocent.cli import (
 # ---------------------------------------------------------------------------
 
 
-def test_check_ollama_returns_true_on_success():
-    with patch("codedocent.ollama_utils.urllib.request.urlopen") as mock_open:
-        mock_open.return_value.__enter__ = MagicMock()
-        mock_open.return_value.__exit__ = MagicMock(return_value=False)
-        assert _check_ollama() is True
+def test_check_ollama_returns_true_on_success(cli_mod):
+    with patch(
+        "codedocent.ollama_utils.urllib.request.urlopen",
+        return_value=_FakeResponse(),
+    ):
+        assert cli_mod._check_ollama() is True
 
 
-def test_check_ollama_returns_false_on_failure():
+def test_check_ollama_returns_false_on_failure(cli_mod):
     with patch(
         "codedocent.ollama_utils.urllib.request.urlopen",
         side_effect=OSError("Connection refused"),
     ):
-        assert _check_ollama() is False
+        assert cli_mod._check_ollama() is False
 
 
 # ---------------------------------------------------------------------------
@@ -43,27 +62,22 @@ def test_check_ollama_returns_false_on_failure():
 # ---------------------------------------------------------------------------
 
 
-def test_fetch_ollama_models_parses_response():
+def test_fetch_ollama_models_parses_response(cli_mod):
     response_data = b'{"models": [{"name": "qwen3:14b"}, {"name": "llama3:8b"}]}'
-    mock_resp = MagicMock()
-    mock_resp.read.return_value = response_data
-    mock_resp.__enter__ = MagicMock(return_value=mock_resp)
-    mock_resp.__exit__ = MagicMock(return_value=False)
-
     with patch(
         "codedocent.ollama_utils.urllib.request.urlopen",
-        return_value=mock_resp,
+        return_value=_FakeResponse(response_data),
     ):
-        models = _fetch_ollama_models()
+        models = cli_mod._fetch_ollama_models()
     assert models == ["qwen3:14b", "llama3:8b"]
 
 
-def test_fetch_ollama_models_returns_empty_on_error():
+def test_fetch_ollama_models_returns_empty_on_error(cli_mod):
     with patch(
         "codedocent.ollama_utils.urllib.request.urlopen",
         side_effect=OSError("fail"),
     ):
-        assert _fetch_ollama_models() == []
+        assert cli_mod._fetch_ollama_models() == []
 
 
 # ---------------------------------------------------------------------------
@@ -71,186 +85,141 @@ def test_fetch_ollama_models_returns_empty_on_error():
 # ---------------------------------------------------------------------------
 
 
-def test_wizard_produces_config(tmp_path):
-    """Wizard with valid inputs produces correct namespace."""
-    folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
+def _mk_input(answers: list[str]):
+    """Return an ``input`` replacement that yields *answers* in order."""
+    it = iter(answers)
+    return lambda _prompt="": next(it)
 
-    # folder, backend=Local(2), model=1, mode=interactive(1)
-    inputs = iter([folder, "2", "1", "1"])
 
-    with (
-        patch("builtins.input", side_effect=inputs),
-        patch("codedocent.cli._check_ollama", return_value=True),
-        patch(
-            "codedocent.cli._fetch_ollama_models",
-            return_value=["qwen3:14b", "llama3:8b"],
-        ),
-    ):
-        result = _run_wizard()
+@pytest.fixture
+def wizard_env(monkeypatch):
+    """Pretend Ollama is running with two local models installed."""
+    monkeypatch.setattr("codedocent.cli._check_ollama", lambda: True)
+    monkeypatch.setattr(
+        "codedocent.cli._fetch_ollama_models",
+        lambda: ["qwen3:14b", "llama3:8b"],
+    )
+    return monkeypatch
+
+
+@pytest.fixture(scope="module")
+def wizard_folder(tmp_path_factory) -> str:
+    """One source folder shared by the wizard tests; they only read it."""
+    folder = tmp_path_factory.mktemp("wiz")
+    (folder / "hello.py").write_text("x = 1\n", encoding="utf-8")
+    return str(folder)
+
+
+def _wiz_inputs(
+    folder: str, mode: str, *, explicit_backend: bool = True,
+) -> list[str]:
+    """Answers for the Local AI path: folder, backend, model=1, mode.
+
+    Without *explicit_backend* the backend prompt gets a bare Enter, which
+    should fall through to the Local default.
+    """
+    return [folder, "2" if explicit_backend else "", "1", mode]
+
 
-    assert result.path == folder
+@pytest.mark.parametrize(
+    "explicit_backend", [True, False], ids=["backend-2", "backend-default"],
+)
+@pytest.mark.parametrize(
+    "mode_input,expected_full,expected_text",
+    [("1", False, False), ("2", True, False), ("3", False, True)],
+    ids=["interactive", "full", "text"],
+)
+def test_wizard_produces_config(
+    cli_mod, wizard_folder, wizard_env,
+    mode_input, expected_full, expected_text, explicit_backend,
+):
+    """Wizard with valid inputs produces the namespace for each mode."""
+    inputs = _wiz_inputs(
+        wizard_folder, mode_input, explicit_backend=explicit_backend,
+    )
+    wizard_env.setattr("builtins.input", _mk_input(inputs))
+
+    result = cli_mod._run_wizard()
+
+    assert result.path == wizard_folder
     assert result.model == "qwen3:14b"
-    assert result.text is False
-    assert result.full is False
+    assert result.text is expected_text
+    assert result.full is expected_full
     assert result.no_ai is False
 
 
-def test_wizard_tilde_expansion(tmp_path):
+def test_wizard_tilde_expansion(cli_mod, wizard_folder, wizard_env):
     """Input with ~ gets expanded."""
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
-
-    inputs = iter([str(tmp_path), "2", "1", "1"])
+    inputs = [wizard_folder, "2", "1", "1"]
+    wizard_env.setattr("builtins.input", _mk_input(inputs))
 
-    with (
-        patch("builtins.input", side_effect=inputs),
-        patch("codedocent.cli._check_ollama", return_value=True),
-        patch(
-            "codedocent.cli._fetch_ollama_models",
-            return_value=["qwen3:14b"],
-        ),
-    ):
-        result = _run_wizard()
+    result = cli_mod._run_wizard()
 
     assert "~" not in result.path
 
 
-def test_wizard_invalid_folder_reprompts(tmp_path):
+def test_wizard_invalid_folder_reprompts(cli_mod, wizard_folder, wizard_env):
     """Invalid folder first, then valid folder on second input."""
-    valid_folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
+    inputs = ["/nonexistent_xyz_path_42", wizard_folder, "2", "1", "1"]
+    wizard_env.setattr("builtins.input", _mk_input(inputs))
 
-    inputs = iter(["/nonexistent_xyz_path_42", valid_folder, "2", "1", "1"])
+    result = cli_mod._run_wizard()
 
-    with (
-        patch("builtins.input", side_effect=inputs),
-        patch("codedocent.cli._check_ollama", return_value=True),
-        patch(
-            "codedocent.cli._fetch_ollama_models",
-            return_value=["qwen3:14b"],
-        ),
-    ):
-        result = _run_wizard()
-
-    assert result.path == valid_folder
+    assert result.path == wizard_folder
 
 
-def test_wizard_ollama_not_running(tmp_path):
+def test_wizard_ollama_not_running(cli_mod, wizard_folder, wizard_env):
     """When Ollama is not running, user can continue with no-ai."""
-    folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
-
     # folder, backend=Local(2), ollama not found -> "y" no-ai, mode=1
-    inputs = iter([folder, "2", "y", "1"])
+    inputs = [wizard_folder, "2", "y", "1"]
+    wizard_env.setattr("builtins.input", _mk_input(inputs))
+    wizard_env.setattr("codedocent.cli._check_ollama", lambda: False)
 
-    with (
-        patch("builtins.input", side_effect=inputs),
-        patch("codedocent.cli._check_ollama", return_value=False),
-    ):
-        result = _run_wizard()
+    result = cli_mod._run_wizard()
 
     assert result.no_ai is True
 
 
-def test_wizard_default_choices(tmp_path):
+def test_wizard_default_choices(cli_mod, wizard_folder, wizard_env):
     """User hits Enter on all prompts -- defaults should apply."""
-    folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
-
     # folder, backend=default(Enter->Local), model=default, mode=default
-    inputs = iter([folder, "", "", ""])
+    inputs = [wizard_folder, "", "", ""]
+    wizard_env.setattr("builtins.input", _mk_input(inputs))
 
-    with (
-        patch("builtins.input", side_effect=inputs),
-        patch("codedocent.cli._check_ollama", return_value=True),
-        patch(
-            "codedocent.cli._fetch_ollama_models",
-            return_value=["qwen3:14b", "llama3:8b"],
-        ),
-    ):
-        result = _run_wizard()
+    result = cli_mod._run_wizard()
 
     assert result.model == "qwen3:14b"
     assert result.text is False
     assert result.full is False
 
 
-def test_wizard_text_mode(tmp_path):
-    """Choosing mode 3 sets text=True."""
-    folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
-
-    inputs = iter([folder, "2", "1", "3"])
-
-    with (
-        patch("builtins.input", side_effect=inputs),
-        patch("codedocent.cli._check_ollama", return_value=True),
-        patch(
-            "codedocent.cli._fetch_ollama_models",
-            return_value=["qwen3:14b"],
-        ),
-    ):
-        result = _run_wizard()
-
-    assert result.text is True
-    assert result.full is False
-
-
-def test_wizard_full_mode(tmp_path):
-    """Choosing mode 2 sets full=True."""
-    folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
-
-    inputs = iter([folder, "2", "1", "2"])
-
-    with (
-        patch("builtins.input", side_effect=inputs),
-        patch("codedocent.cli._check_ollama", return_value=True),
-        patch(
-            "codedocent.cli._fetch_ollama_models",
-            return_value=["qwen3:14b"],
-        ),
-    ):
-        result = _run_wizard()
-
-    assert result.full is True
-    assert result.text is False
-
-
 # ---------------------------------------------------------------------------
 # _run_wizard cloud path tests
 # ---------------------------------------------------------------------------
 
 
+_HELLO_BODY = b'{"choices": [{"message": {"content": "Hello"}}]}'
+
+
 def _make_cloud_response():
-    """Build mock urlopen response for cloud validation."""
-    body = json.dumps({
-        "choices": [{"message": {"content": "Hello"}}],
-    }).encode()
-    resp = MagicMock()
-    resp.read.return_value = body
-    resp.__enter__ = MagicMock(return_value=resp)
-    resp.__exit__ = MagicMock(return_value=False)
-    return resp
-
-
-def test_wizard_cloud_path(tmp_path):
-    """Wizard cloud path sets ai_config on result."""
-    folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
+    """Build a fake urlopen response for cloud validation."""
+    return _FakeResponse(_HELLO_BODY)
+
 
+def test_wizard_cloud_path(cli_mod, wizard_folder, monkeypatch):
+    """Wizard cloud path sets ai_config on result."""
     # folder, backend=Cloud(1), provider=OpenAI(1), model=1, mode=1
-    inputs = iter([folder, "1", "1", "1", "1"])
+    inputs = [wizard_folder, "1", "1", "1", "1"]
+    monkeypatch.setattr("builtins.input", _mk_input(inputs))
 
     with (
-        patch("builtins.input", side_effect=inputs),
         patch.dict(os.environ, {"OPENAI_API_KEY": "test-key-not-real"}),
         patch(
             "codedocent.cloud_ai.urllib.request.urlopen",
             return_value=_make_cloud_response(),
         ),
     ):
-        result = _run_wizard()
+        result = cli_mod._run_wizard()
 
     assert result.ai_config is not None
     assert result.ai_config["backend"] == "cloud"
@@ -258,16 +227,13 @@ def test_wizard_cloud_path(tmp_path):
     assert result.no_ai is False
 
 
-def test_wizard_no_ai_path(tmp_path):
+def test_wizard_no_ai_path(cli_mod, wizard_folder, monkeypatch):
     """Wizard no-AI path sets no_ai=True."""
-    folder = str(tmp_path)
-    (tmp_path / "hello.py").write_text("x = 1\n", encoding="utf-8")
-
     # folder, backend=No AI(3), mode=1
-    inputs = iter([folder, "3", "1"])
+    inputs = [wizard_folder, "3", "1"]
+    monkeypatch.setattr("builtins.input", _mk_input(inputs))
 
-    with patch("builtins.input", side_effect=inputs):
-        result = _run_wizard()
+    result = cli_mod._run_wizard()
 
     assert result.no_ai is True
     assert result.ai_config is None
@@ -278,17 +244,21 @@ def test_wizard_no_ai_path(tmp_path):
 # ---------------------------------------------------------------------------
 
 
-def test_parse_cloud_openai():
+@pytest.fixture(scope="session")
+def arg_parser(cli_mod) -> argparse.ArgumentParser:
+    """Build the CLI parser once; parse_args does not mutate it."""
+    return cli_mod._build_arg_parser()
+
+
+def test_parse_cloud_openai(arg_parser):
     """--cloud openai is parsed correctly."""
-    parser = _build_arg_parser()
-    args = parser.parse_args(["/some/path", "--cloud", "openai"])
+    args = arg_parser.parse_args(["/some/path", "--cloud", "openai"])
     assert args.cloud == "openai"
 
 
-def test_parse_cloud_custom():
+def test_parse_cloud_custom(arg_parser):
     """--cloud custom with --endpoint is parsed correctly."""
-    parser = _build_arg_parser()
-    args = parser.parse_args([
+    args = arg_parser.parse_args([
         "/some/path", "--cloud", "custom",
         "--endpoint", "https://my.api/v1/chat/completions",
     ])
@@ -296,10 +266,9 @@ def test_parse_cloud_custom():
     assert args.endpoint == "https://my.api/v1/chat/completions"
 
 
-def test_parse_api_key_env():
+def test_parse_api_key_env(arg_parser):
     """--api-key-env is parsed correctly."""
-    parser = _build_arg_parser()
-    args = parser.parse_args([
+    args = arg_parser.parse_args([
         "/some/path", "--cloud", "openai", "--api-key-env", "MY_KEY",
     ])
     assert args.api_key_env == "MY_KEY"
@@ -310,19 +279,27 @@ def test_parse_api_key_env():
 # ---------------------------------------------------------------------------
 
 
-def test_build_ai_config_none_without_cloud():
+_NS_DEFAULTS = {
+    "cloud": None, "endpoint": None, "api_key_env": None, "model": None,
+}
+
+
+def _ns(**overrides) -> argparse.Namespace:
+    """Build CLI args from the defaults with *overrides* applied."""
+    return argparse.Namespace(**{**_NS_DEFAULTS, **overrides})
+
+
+def test_build_ai_config_none_without_cloud(cli_mod):
     """Without --cloud, _build_ai_config returns None."""
-    args = argparse.Namespace(cloud=None)
-    assert _build_ai_config(args) is None
+    args = _ns()
+    assert cli_mod._build_ai_config(args) is None
 
 
-def test_build_ai_config_openai():
+def test_build_ai_config_openai(cli_mod):
     """--cloud openai builds correct config."""
-    args = argparse.Namespace(
-        cloud="openai", endpoint=None, api_key_env=None, model="gpt-4.1-nano",
-    )
+    args = _ns(cloud="openai", model="gpt-4.1-nano")
     with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key-not-real"}):
-        config = _build_ai_config(args)
+        config = cli_mod._build_ai_config(args)
 
     assert config is not None
     assert config["backend"] == "cloud"
@@ -331,35 +308,47 @@ def test_build_ai_config_openai():
     assert config["api_key"].reveal() == "test-key-not-real"
 
 
-def test_build_ai_config_custom_without_endpoint():
+def test_build_ai_config_custom_without_endpoint(cli_mod):
     """--cloud custom without --endpoint exits with error."""
-    args = argparse.Namespace(
-        cloud="custom", endpoint=None, api_key_env=None, model="test",
-    )
+    args = _ns(cloud="custom", model="test")
     with pytest.raises(SystemExit):
-        _build_ai_config(args)
+        cli_mod._build_ai_config(args)
 
 
-def test_build_ai_config_missing_api_key():
+def test_build_ai_config_missing_api_key(cli_mod):
     """Missing API key exits with error."""
-    args = argparse.Namespace(
-        cloud="openai", endpoint=None, api_key_env=None, model="gpt-test",
-    )
+    args = _ns(cloud="openai", model="gpt-test")
     with (
         patch.dict(os.environ, {}, clear=True),
         pytest.raises(SystemExit),
     ):
-        _build_ai_config(args)
+        cli_mod._build_ai_config(args)
 
 
-def test_build_ai_config_custom_env_var():
+def test_build_ai_config_custom_env_var(cli_mod):
     """--api-key-env overrides the default env var."""
-    args = argparse.Namespace(
-        cloud="openai", endpoint=None, api_key_env="MY_KEY",
-        model="gpt-test",
-    )
+    args = _ns(cloud="openai", api_key_env="MY_KEY", model="gpt-test")
     with patch.dict(os.environ, {"MY_KEY": "test-key-not-real"}):
-        config = _build_ai_config(args)
+        config = cli_mod._build_ai_config(args)
 
     assert config is not None
     assert config["api_key"].reveal() == "test-key-not-real"
+
+
+# ---------------------------------------------------------------------------
+# Import cost
+# ---------------------------------------------------------------------------
+
+
+def test_cli_import_defers_heavy_modules():
+    """Importing the CLI must not pull in the analyzer, server, or ollama."""
+    code = (
+        "import sys, codedocent.cli; "
+        "print(','.join(m for m in ('ollama', 'radon', 'codedocent.analyzer',"
+        " 'codedocent.renderer', 'codedocent.server') if m in sys.modules))"
+    )
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == ""
@@ -4,8 +4,8 @@ from __future__ import annotations
 
 import io
 import json
+import re
 import urllib.error
-from unittest.mock import patch, MagicMock
 
 import pytest
 
@@ -20,17 +20,98 @@ _TEST_KEY = "test-key-not-real"
 _TEST_ENDPOINT = "https://api.example.com/v1/chat/completions"
 _TEST_MODEL = "gpt-test"
 
+# Error-message patterns for pytest.raises(match=...), compiled once.
+_RE = {
+    "unauth": re.compile("Unauthorized"),
+    "rate": re.compile("Rate limited"),
+    "server": re.compile("Server error"),
+    "conn": re.compile("Connection failed"),
+    "invalid": re.compile("Invalid response from API"),
+    "format": re.compile("Unexpected response format"),
+    "https": re.compile("HTTPS"),
+    "scheme": re.compile("Invalid URL scheme"),
+    "host": re.compile("missing hostname"),
+}
 
-def _make_response(content: str = "Hello") -> MagicMock:
-    """Build a mock urlopen response with valid chat-completion JSON."""
-    body = json.dumps({
+
+class _FakeResponse:
+    """Minimal stand-in for the context manager ``urlopen`` returns."""
+
+    __slots__ = ("_body",)
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def read(self, _amt: int | None = None) -> bytes:
+        return self._body
+
+    def __enter__(self) -> _FakeResponse:
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+def _encode_content(content: str) -> bytes:
+    """Encode a valid chat-completion JSON body carrying *content*."""
+    return json.dumps({
         "choices": [{"message": {"content": content}}],
     }).encode("utf-8")
-    resp = MagicMock()
-    resp.read.return_value = body
-    resp.__enter__ = MagicMock(return_value=resp)
-    resp.__exit__ = MagicMock(return_value=False)
-    return resp
+
+
+_HELLO_BODY = b'{"choices": [{"message": {"content": "Hello"}}]}'
+_RESP_MISSING = b'{"result": "ok"}'
+
+
+@pytest.fixture(scope="session")
+def make_response():
+    """Factory for urlopen responses; the default body is pre-encoded."""
+
+    def _make(content: str = "Hello") -> _FakeResponse:
+        body = _HELLO_BODY if content == "Hello" else _encode_content(content)
+        return _FakeResponse(body)
+
+    return _make
+
+
+def _raiser(exc: Exception):
+    """Return a urlopen stub body that raises *exc*."""
+    def _fn(_req):
+        raise exc
+    return _fn
+
+
+_HTTP_REASONS = {
+    401: "Unauthorized",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+def _http_error(code: int) -> urllib.error.HTTPError:
+    """Build a fresh ``HTTPError`` for *code* with its own body."""
+    return urllib.error.HTTPError(
+        _TEST_ENDPOINT, code, _HTTP_REASONS[code], {}, io.BytesIO(b""),
+    )
+
+
+@pytest.fixture(autouse=True)
+def stub_urlopen(monkeypatch, make_response):
+    """Swap ``urlopen`` for a controllable stub in every test.
+
+    Set ``stub_urlopen["fn"]`` to change the response (or raise); each
+    Request sent is recorded in ``stub_urlopen["requests"]``.
+    """
+    holder: dict = {"fn": lambda req: make_response(), "requests": []}
+
+    def _urlopen(req, timeout=None):  # pylint: disable=unused-argument
+        holder["requests"].append(req)
+        return holder["fn"](req)
+
+    monkeypatch.setattr(
+        "codedocent.cloud_ai.urllib.request.urlopen", _urlopen,
+    )
+    return holder
 
 
 # ---------------------------------------------------------------------------
@@ -38,15 +119,13 @@ def _make_response(content: str = "Hello") -> MagicMock:
 # ---------------------------------------------------------------------------
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_request_body_format(mock_urlopen):
+def test_request_body_format(stub_urlopen, make_response):
     """Verify JSON body has correct fields."""
-    mock_urlopen.return_value = _make_response()
+    stub_urlopen["fn"] = lambda req: make_response()
 
     cloud_chat("Test prompt", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
-    call_args = mock_urlopen.call_args
-    req = call_args[0][0]
+    req = stub_urlopen["requests"][-1]
     body = json.loads(req.data.decode("utf-8"))
     assert body["model"] == _TEST_MODEL
     assert body["messages"] == [{"role": "user", "content": "Test prompt"}]
@@ -54,14 +133,13 @@ def test_request_body_format(mock_urlopen):
     assert body["max_tokens"] == 1024
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_request_headers(mock_urlopen):
+def test_request_headers(stub_urlopen, make_response):
     """Verify Authorization, Content-Type, and User-Agent headers."""
-    mock_urlopen.return_value = _make_response()
+    stub_urlopen["fn"] = lambda req: make_response()
 
     cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
-    req = mock_urlopen.call_args[0][0]
+    req = stub_urlopen["requests"][-1]
     assert req.get_header("Authorization") == f"Bearer {_TEST_KEY}"
     assert req.get_header("Content-type") == "application/json"
     assert req.get_header("User-agent") == "Codedocent/0.5.0"
@@ -72,10 +150,9 @@ def test_request_headers(mock_urlopen):
 # ---------------------------------------------------------------------------
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_success_returns_content(mock_urlopen):
+def test_success_returns_content(stub_urlopen, make_response):
     """Valid response returns the content string."""
-    mock_urlopen.return_value = _make_response("SUMMARY: works great")
+    stub_urlopen["fn"] = lambda req: make_response("SUMMARY: works great")
 
     result = cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
     assert result == "SUMMARY: works great"
@@ -86,33 +163,24 @@ def test_success_returns_content(mock_urlopen):
 # ---------------------------------------------------------------------------
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_http_401_unauthorized(mock_urlopen):
+def test_http_401_unauthorized(stub_urlopen):
     """HTTP 401 mentions 'Unauthorized'."""
-    mock_urlopen.side_effect = urllib.error.HTTPError(
-        _TEST_ENDPOINT, 401, "Unauthorized", {}, io.BytesIO(b""),
-    )
-    with pytest.raises(RuntimeError, match="Unauthorized"):
+    stub_urlopen["fn"] = _raiser(_http_error(401))
+    with pytest.raises(RuntimeError, match=_RE["unauth"]):
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_http_429_rate_limited(mock_urlopen):
+def test_http_429_rate_limited(stub_urlopen):
     """HTTP 429 mentions 'Rate limited'."""
-    mock_urlopen.side_effect = urllib.error.HTTPError(
-        _TEST_ENDPOINT, 429, "Too Many Requests", {}, io.BytesIO(b""),
-    )
-    with pytest.raises(RuntimeError, match="Rate limited"):
+    stub_urlopen["fn"] = _raiser(_http_error(429))
+    with pytest.raises(RuntimeError, match=_RE["rate"]):
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_http_500_server_error(mock_urlopen):
+def test_http_500_server_error(stub_urlopen):
     """HTTP 500 mentions 'Server error'."""
-    mock_urlopen.side_effect = urllib.error.HTTPError(
-        _TEST_ENDPOINT, 500, "Internal Server Error", {}, io.BytesIO(b""),
-    )
-    with pytest.raises(RuntimeError, match="Server error"):
+    stub_urlopen["fn"] = _raiser(_http_error(500))
+    with pytest.raises(RuntimeError, match=_RE["server"]):
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
 
@@ -121,37 +189,26 @@ def test_http_500_server_error(mock_urlopen):
 # ---------------------------------------------------------------------------
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_connection_failed(mock_urlopen):
+def test_connection_failed(stub_urlopen):
     """URLError / OSError yields 'Connection failed'."""
-    mock_urlopen.side_effect = urllib.error.URLError("timeout")
-    with pytest.raises(RuntimeError, match="Connection failed"):
+    stub_urlopen["fn"] = _raiser(urllib.error.URLError("timeout"))
+    with pytest.raises(RuntimeError, match=_RE["conn"]):
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_malformed_json(mock_urlopen):
+def test_malformed_json(stub_urlopen):
     """Invalid JSON yields 'Invalid response from API'."""
-    resp = MagicMock()
-    resp.read.return_value = b"not json at all"
-    resp.__enter__ = MagicMock(return_value=resp)
-    resp.__exit__ = MagicMock(return_value=False)
-    mock_urlopen.return_value = resp
+    stub_urlopen["fn"] = lambda req: _FakeResponse(b"not json at all")
 
-    with pytest.raises(RuntimeError, match="Invalid response from API"):
+    with pytest.raises(RuntimeError, match=_RE["invalid"]):
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_missing_fields(mock_urlopen):
+def test_missing_fields(stub_urlopen):
     """Valid JSON but missing choices[0].message.content."""
-    resp = MagicMock()
-    resp.read.return_value = json.dumps({"result": "ok"}).encode("utf-8")
-    resp.__enter__ = MagicMock(return_value=resp)
-    resp.__exit__ = MagicMock(return_value=False)
-    mock_urlopen.return_value = resp
+    stub_urlopen["fn"] = lambda req: _FakeResponse(_RESP_MISSING)
 
-    with pytest.raises(RuntimeError, match="Unexpected response format"):
+    with pytest.raises(RuntimeError, match=_RE["format"]):
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
 
 
@@ -160,40 +217,46 @@ def test_missing_fields(mock_urlopen):
 # ---------------------------------------------------------------------------
 
 
-def test_endpoint_https_required():
-    """Non-localhost HTTP endpoints are rejected."""
-    with pytest.raises(ValueError, match="HTTPS"):
-        _validate_endpoint("http://api.openai.com/v1/chat/completions")
-
-
-def test_endpoint_localhost_http_allowed():
-    """HTTP is allowed for localhost."""
-    result = _validate_endpoint("http://localhost:8080/v1/chat/completions")
-    assert result == "http://localhost:8080/v1/chat/completions"
-
-
-def test_endpoint_127_http_allowed():
-    """HTTP is allowed for 127.0.0.1."""
-    result = _validate_endpoint("http://127.0.0.1:8080/v1/chat/completions")
-    assert result == "http://127.0.0.1:8080/v1/chat/completions"
-
-
-def test_endpoint_invalid_scheme():
-    """ftp:// and other schemes are rejected."""
-    with pytest.raises(ValueError, match="Invalid URL scheme"):
-        _validate_endpoint("ftp://example.com/model")
-
-
-def test_endpoint_missing_hostname():
-    """URL without hostname is rejected."""
-    with pytest.raises(ValueError, match="missing hostname"):
-        _validate_endpoint("https://")
+@pytest.mark.parametrize(
+    "url,pattern",
+    [
+        ("http://api.openai.com/v1/chat/completions", _RE["https"]),
+        ("ftp://example.com/model", _RE["scheme"]),
+        ("https://", _RE["host"]),
+    ],
+    ids=["http-remote", "ftp-scheme", "no-hostname"],
+)
+def test_endpoint_invalid(url, pattern):
+    """Remote HTTP, non-HTTP schemes and missing hostnames are rejected."""
+    with pytest.raises(ValueError, match=pattern):
+        _validate_endpoint(url)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://localhost:8080/v1/chat/completions",
+        "http://127.0.0.1:8080/v1/chat/completions",
+        _TEST_ENDPOINT,
+    ],
+    ids=["http-localhost", "http-127", "https"],
+)
+def test_endpoint_valid(url):
+    """Local HTTP and any HTTPS endpoint pass through unchanged."""
+    assert _validate_endpoint(url) == url
 
 
-def test_endpoint_valid_https():
-    """Valid HTTPS URL passes."""
-    result = _validate_endpoint(_TEST_ENDPOINT)
-    assert result == _TEST_ENDPOINT
+def test_endpoint_http_host_resolved_on_every_call(monkeypatch):
+    """A host that stops resolving to loopback is rejected on the next call."""
+    answers = iter(["127.0.0.1", "203.0.113.7"])
+    monkeypatch.setattr(
+        "codedocent.cloud_ai.socket.getaddrinfo",
+        lambda *_a, **_kw: [(None, None, None, "", (next(answers), 0))],
+    )
+    url = "http://llm.internal:8080/v1/chat/completions"
+    assert _validate_endpoint(url) == url
+    with pytest.raises(ValueError, match=_RE["https"]):
+        _validate_endpoint(url)
 
 
 # ---------------------------------------------------------------------------
@@ -201,10 +264,9 @@ def test_endpoint_valid_https():
 # ---------------------------------------------------------------------------
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_validate_cloud_config_success(mock_urlopen):
+def test_validate_cloud_config_success(stub_urlopen, make_response):
     """Successful validation returns (True, '')."""
-    mock_urlopen.return_value = _make_response("Hello")
+    stub_urlopen["fn"] = lambda req: make_response("Hello")
 
     ok, msg = validate_cloud_config(
         "openai", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL,
@@ -213,12 +275,9 @@ def test_validate_cloud_config_success(mock_urlopen):
     assert msg == ""
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_validate_cloud_config_failure(mock_urlopen):
+def test_validate_cloud_config_failure(stub_urlopen):
     """Failed validation returns (False, error_message)."""
-    mock_urlopen.side_effect = urllib.error.HTTPError(
-        _TEST_ENDPOINT, 401, "Unauthorized", {}, io.BytesIO(b""),
-    )
+    stub_urlopen["fn"] = _raiser(_http_error(401))
 
     ok, msg = validate_cloud_config(
         "openai", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL,
@@ -232,21 +291,17 @@ def test_validate_cloud_config_failure(mock_urlopen):
 # ---------------------------------------------------------------------------
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_api_key_not_in_error_message(mock_urlopen):
+def test_api_key_not_in_error_message(stub_urlopen):
     """Error messages must never contain the API key."""
-    mock_urlopen.side_effect = urllib.error.HTTPError(
-        _TEST_ENDPOINT, 401, "Unauthorized", {}, io.BytesIO(b""),
-    )
+    stub_urlopen["fn"] = _raiser(_http_error(401))
     with pytest.raises(RuntimeError) as exc_info:
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
     assert _TEST_KEY not in str(exc_info.value)
 
 
-@patch("codedocent.cloud_ai.urllib.request.urlopen")
-def test_api_key_not_in_connection_error(mock_urlopen):
+def test_api_key_not_in_connection_error(stub_urlopen):
     """Connection failure message must not contain the API key."""
-    mock_urlopen.side_effect = urllib.error.URLError("timeout")
+    stub_urlopen["fn"] = _raiser(urllib.error.URLError("timeout"))
     with pytest.raises(RuntimeError) as exc_info:
         cloud_chat("Test", _TEST_ENDPOINT, _TEST_KEY, _TEST_MODEL)
     assert _TEST_KEY not in str(exc_info.value)
@@ -257,10 +312,14 @@ def test_api_key_not_in_connection_error(mock_urlopen):
 # ---------------------------------------------------------------------------
 
 
-def test_cloud_providers_have_required_fields():
-    """All providers have name, endpoint, env_var, and models."""
-    for key, provider in CLOUD_PROVIDERS.items():
-        assert "name" in provider, f"{key} missing name"
-        assert "endpoint" in provider, f"{key} missing endpoint"
-        assert "env_var" in provider, f"{key} missing env_var"
-        assert "models" in provider, f"{key} missing models"
+_PROVIDER_FIELDS = ("name", "endpoint", "env_var", "models")
+
+
+@pytest.mark.parametrize(
+    "key,provider", list(CLOUD_PROVIDERS.items()),
+    ids=list(CLOUD_PROVIDERS),
+)
+def test_cloud_providers_have_required_fields(key, provider):
+    """Each provider has name, endpoint, env_var, and models."""
+    for field in _PROVIDER_FIELDS:
+        assert field in provider, f"{key} missing {field}"
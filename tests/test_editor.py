@@ -4,7 +4,6 @@ from __future__ import annotations
 
 import glob
 import os
-import time
 from pathlib import Path
 from unittest.mock import patch
 
@@ -18,15 +17,25 @@ from codedocent.editor import (
 
 
 SAMPLE_CONTENT = "line1\nline2\nline3\nline4\nline5\n"
+SAMPLE_CONTENT_BYTES = SAMPLE_CONTENT.encode("utf-8")
 
 
 def _write_sample(tmp_path: Path) -> Path:
     """Write a sample file and return its path."""
     p = tmp_path / "sample.py"
-    p.write_text(SAMPLE_CONTENT, encoding="utf-8")
+    p.write_bytes(SAMPLE_CONTENT_BYTES)
     return p
 
 
+def _only_backup(p: Path) -> Path:
+    """Return the single ``.bak.*`` backup next to *p*."""
+    prefix = p.name + ".bak."
+    with os.scandir(p.parent) as it:
+        entries = [e.path for e in it if e.name.startswith(prefix)]
+    assert len(entries) == 1
+    return Path(entries[0])
+
+
 def test_successful_replacement(tmp_path: Path) -> None:
     p = _write_sample(tmp_path)
     result = replace_block_source(str(p), 2, 3, "replaced_a\nreplaced_b\n")
@@ -42,9 +51,7 @@ def test_successful_replacement(tmp_path: Path) -> None:
     assert "line4\n" in new_text
 
     # Backup must exist with original content (timestamped)
-    bak_files = glob.glob(str(p) + ".bak.*")
-    assert len(bak_files) == 1
-    assert Path(bak_files[0]).read_text(encoding="utf-8") == SAMPLE_CONTENT
+    assert _only_backup(p).read_text(encoding="utf-8") == SAMPLE_CONTENT
 
 
 def test_replacement_shrinks_block(tmp_path: Path) -> None:
@@ -55,8 +62,7 @@ def test_replacement_shrinks_block(tmp_path: Path) -> None:
     assert result["lines_before"] == 3
     assert result["lines_after"] == 1
 
-    lines = p.read_text(encoding="utf-8").splitlines()
-    assert len(lines) == 3  # was 5, removed 3, added 1
+    assert p.read_bytes().count(b"\n") == 3  # was 5, removed 3, added 1
 
 
 def test_replacement_grows_block(tmp_path: Path) -> None:
@@ -67,8 +73,7 @@ def test_replacement_grows_block(tmp_path: Path) -> None:
     assert result["lines_before"] == 1
     assert result["lines_after"] == 3
 
-    lines = p.read_text(encoding="utf-8").splitlines()
-    assert len(lines) == 7  # was 5, removed 1, added 3
+    assert p.read_bytes().count(b"\n") == 7  # was 5, removed 1, added 3
 
 
 def test_empty_replacement_deletes_block(tmp_path: Path) -> None:
@@ -79,8 +84,7 @@ def test_empty_replacement_deletes_block(tmp_path: Path) -> None:
     assert result["lines_before"] == 3
     assert result["lines_after"] == 0
 
-    lines = p.read_text(encoding="utf-8").splitlines()
-    assert len(lines) == 2  # line1 and line5 remain
+    assert p.read_bytes().count(b"\n") == 2  # line1 and line5 remain
 
 
 def test_file_not_found() -> None:
@@ -89,28 +93,27 @@ def test_file_not_found() -> None:
     assert "File not found" in result["error"]
 
 
-def test_invalid_line_numbers(tmp_path: Path) -> None:
-    p = _write_sample(tmp_path)
-    path = str(p)
-
-    # start > end
-    r = replace_block_source(path, 3, 1, "x")
-    assert r["success"] is False
-    assert "Invalid line range" in r["error"]
-
-    # end > file length
-    r = replace_block_source(path, 1, 999, "x")
-    assert r["success"] is False
-    assert "exceeds file length" in r["error"]
+@pytest.fixture(scope="module")
+def readonly_sample(tmp_path_factory) -> str:
+    """Sample file shared by tests whose edits are rejected before writing."""
+    return str(_write_sample(tmp_path_factory.mktemp("editor")))
 
-    # zero / negative
-    r = replace_block_source(path, 0, 2, "x")
-    assert r["success"] is False
-    assert "Invalid line range" in r["error"]
 
-    r = replace_block_source(path, -1, 2, "x")
+@pytest.mark.parametrize(
+    "start,end,msg",
+    [
+        (3, 1, "Invalid line range"),  # start > end
+        (1, 999, "exceeds file length"),
+        (0, 2, "Invalid line range"),
+        (-1, 2, "Invalid line range"),
+    ],
+)
+def test_invalid_line_numbers(
+    readonly_sample: str, start: int, end: int, msg: str,
+) -> None:
+    r = replace_block_source(readonly_sample, start, end, "x")
     assert r["success"] is False
-    assert "Invalid line range" in r["error"]
+    assert msg in r["error"]
 
 
 def test_bak_contains_original(tmp_path: Path) -> None:
@@ -119,9 +122,7 @@ def test_bak_contains_original(tmp_path: Path) -> None:
 
     replace_block_source(str(p), 1, 5, "completely new\n")
 
-    bak_files = glob.glob(str(p) + ".bak.*")
-    assert len(bak_files) == 1
-    assert Path(bak_files[0]).read_text(encoding="utf-8") == original
+    assert _only_backup(p).read_text(encoding="utf-8") == original
 
 
 def test_non_utf8_file_returns_error(tmp_path: Path) -> None:
@@ -154,10 +155,8 @@ def test_backup_is_timestamped(tmp_path: Path) -> None:
     p = _write_sample(tmp_path)
     replace_block_source(str(p), 2, 3, "replaced\n")
 
-    bak_files = glob.glob(str(p) + ".bak.*")
-    assert len(bak_files) == 1
     # Extract timestamp suffix after ".bak."
-    suffix = bak_files[0].rsplit(".bak.", 1)[1]
+    suffix = _only_backup(p).name.rsplit(".bak.", 1)[1]
     assert len(suffix) == 22  # YYYYMMDDTHHMMSS.uuuuuu
     assert suffix[8] == "T"
     assert suffix[15] == "."
@@ -166,9 +165,12 @@ def test_backup_is_timestamped(tmp_path: Path) -> None:
 def test_multiple_saves_create_multiple_backups(tmp_path: Path) -> None:
     """Fix 8: each save creates a distinct timestamped backup."""
     p = _write_sample(tmp_path)
-    replace_block_source(str(p), 2, 2, "first\n")
-    time.sleep(1)
-    replace_block_source(str(p), 2, 2, "second\n")
+    with patch("codedocent.editor.datetime") as mock_dt:
+        mock_now = mock_dt.now.return_value
+        mock_now.strftime.side_effect = ["20260101T120000", "20260101T120001"]
+        mock_now.microsecond = 0
+        replace_block_source(str(p), 2, 2, "first\n")
+        replace_block_source(str(p), 2, 2, "second\n")
 
     bak_files = glob.glob(str(p) + ".bak.*")
     assert len(bak_files) == 2
@@ -7,54 +7,51 @@ from unittest.mock import patch
 import pytest
 
 
+@pytest.fixture(scope="module")
+def gui_mod():
+    """Import codedocent.gui once for the whole module."""
+    import codedocent.gui  # pylint: disable=import-outside-toplevel
+    return codedocent.gui
+
+
+@pytest.fixture
+def failing_urlopen():
+    """Make every Ollama HTTP probe fail as if the server were down."""
+    with patch(
+        "codedocent.ollama_utils.urllib.request.urlopen",
+        side_effect=OSError("fail"),
+    ) as mock_open:
+        yield mock_open
+
+
 def test_gui_module_imports():
     """Verify codedocent.gui can be imported."""
     import codedocent.gui  # noqa: F401
 
 
-def test_gui_main_exists():
+def test_gui_main_exists(gui_mod):
     """Verify main function exists and is callable."""
-    from codedocent.gui import main
-
-    assert callable(main)
+    assert callable(gui_mod.main)
 
 
-def test_gui_missing_tkinter_prints_message(capsys):
+def test_gui_missing_tkinter_prints_message(gui_mod, monkeypatch, capsys):
     """When tkinter is unavailable, main() prints helpful error and exits."""
-    import codedocent.gui as gui_mod
-
-    original_has_tk = gui_mod._HAS_TK
-    gui_mod._HAS_TK = False
-    try:
-        with pytest.raises(SystemExit) as exc_info:
-            gui_mod.main()
-        assert exc_info.value.code == 1
-        captured = capsys.readouterr()
-        assert "tkinter is not installed" in captured.out
-    finally:
-        gui_mod._HAS_TK = original_has_tk
+    monkeypatch.setattr(gui_mod, "_HAS_TK", False)
+    with pytest.raises(SystemExit) as exc_info:
+        gui_mod.main()
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert "tkinter is not installed" in captured.out
 
 
-def test_gui_check_ollama_returns_bool():
+def test_gui_check_ollama_returns_bool(gui_mod, failing_urlopen):
     """_check_ollama in gui module returns a boolean."""
-    from codedocent.gui import _check_ollama
-
-    with patch(
-        "codedocent.ollama_utils.urllib.request.urlopen",
-        side_effect=OSError("fail"),
-    ):
-        assert _check_ollama() is False
+    assert gui_mod._check_ollama() is False
 
 
-def test_gui_fetch_ollama_models_returns_list():
+def test_gui_fetch_ollama_models_returns_list(gui_mod, failing_urlopen):
     """_fetch_ollama_models in gui module returns a list."""
-    from codedocent.gui import _fetch_ollama_models
-
-    with patch(
-        "codedocent.ollama_utils.urllib.request.urlopen",
-        side_effect=OSError("fail"),
-    ):
-        assert _fetch_ollama_models() == []
+    assert gui_mod._fetch_ollama_models() == []
 
 
 # ---------------------------------------------------------------------------
@@ -62,31 +59,19 @@ def test_gui_fetch_ollama_models_returns_list():
 # ---------------------------------------------------------------------------
 
 
-def test_gui_has_backend_row_creator():
-    """_create_backend_row exists and is callable."""
-    from codedocent.gui import _create_backend_row
-
-    assert callable(_create_backend_row)
-
-
-def test_gui_has_cloud_provider_row_creator():
-    """_create_cloud_provider_row exists and is callable."""
-    from codedocent.gui import _create_cloud_provider_row
-
-    assert callable(_create_cloud_provider_row)
-
-
-def test_gui_has_cloud_model_row_creator():
-    """_create_cloud_model_row exists and is callable."""
-    from codedocent.gui import _create_cloud_model_row
-
-    assert callable(_create_cloud_model_row)
+@pytest.mark.parametrize("attr", [
+    "_create_backend_row",
+    "_create_cloud_provider_row",
+    "_create_cloud_model_row",
+])
+def test_gui_row_creators_callable(gui_mod, attr):
+    """Each cloud UI row creator exists and is callable."""
+    assert callable(getattr(gui_mod, attr))
 
 
-def test_gui_provider_keys_match_cloud_providers():
+def test_gui_provider_keys_match_cloud_providers(gui_mod):
     """_PROVIDER_KEYS matches CLOUD_PROVIDERS dict keys."""
-    from codedocent.gui import _PROVIDER_KEYS
     from codedocent.cloud_ai import CLOUD_PROVIDERS
 
-    for key in _PROVIDER_KEYS:
+    for key in gui_mod._PROVIDER_KEYS:
         assert key in CLOUD_PROVIDERS
@@ -1,5 +1,7 @@
 """Tests for codedocent.parser."""
 
+import pytest
+
 from codedocent.parser import parse_file
 
 
@@ -23,8 +25,14 @@ def standalone():
 '''
 
 
-def test_parse_python_structure():
-    node = parse_file("test.py", "python", source=SAMPLE_PYTHON)
+@pytest.fixture(scope="module")
+def py_tree():
+    """SAMPLE_PYTHON parsed once; tests must not mutate it."""
+    return parse_file("test.py", "python", source=SAMPLE_PYTHON)
+
+
+def test_parse_python_structure(py_tree):
+    node = py_tree
 
     assert node.node_type == "file"
     assert node.name == "test.py"
@@ -54,10 +62,9 @@ def test_parse_python_structure():
     assert func.end_line == 16
 
 
-def test_parse_python_imports():
-    node = parse_file("test.py", "python", source=SAMPLE_PYTHON)
-    assert "os" in node.imports
-    assert "pathlib" in node.imports
+def test_parse_python_imports(py_tree):
+    assert "os" in py_tree.imports
+    assert "pathlib" in py_tree.imports
 
 
 SAMPLE_JS = '''\
@@ -83,8 +90,14 @@ const util = () => {
 '''
 
 
-def test_parse_javascript_structure():
-    node = parse_file("app.js", "javascript", source=SAMPLE_JS)
+@pytest.fixture(scope="module")
+def js_tree():
+    """SAMPLE_JS parsed once; tests must not mutate it."""
+    return parse_file("app.js", "javascript", source=SAMPLE_JS)
+
+
+def test_parse_javascript_structure(js_tree):
+    node = js_tree
 
     assert node.node_type == "file"
     assert node.language == "javascript"
@@ -109,9 +122,8 @@ def test_parse_javascript_structure():
     assert arrow.name == "util"
 
 
-def test_parse_javascript_imports():
-    node = parse_file("app.js", "javascript", source=SAMPLE_JS)
-    assert "react" in node.imports
+def test_parse_javascript_imports(js_tree):
+    assert "react" in js_tree.imports
 
 
 def test_parse_unknown_language():
@@ -1,6 +1,7 @@
 """Tests for codedocent.renderer."""
 
 import os
+from pathlib import Path
 
 import pytest
 
@@ -57,6 +58,14 @@ def _make_tree() -> CodeNode:
     return root
 
 
+@pytest.fixture(scope="module")
+def rendered_html(tmp_path_factory) -> tuple[str, str]:
+    """Render the sample tree once; return ``(output_path, html)``."""
+    out = str(tmp_path_factory.mktemp("render") / "output.html")
+    render(_make_tree(), out)
+    return out, Path(out).read_text(encoding="utf-8")
+
+
 def test_render_creates_file(tmp_path):
     root = _make_tree()
     out = str(tmp_path / "output.html")
@@ -64,54 +73,31 @@ def test_render_creates_file(tmp_path):
     assert os.path.isfile(out)
 
 
-def test_render_contains_node_names(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
-    for name in ("src", "app.py", "Greeter", "greet"):
-        assert name in html
+# Substrings the static render of _make_tree() must contain: node names,
+# imports, placeholders, line counts, code actions and embedded source.
+REQUIRED_TOKENS = (
+    "src", "app.py", "Greeter", "greet",
+    "IMPORTS", "os", "sys",
+    "AI summary pending...",
+    "10 lines",
+    "Show Code", "Export Code", "Copy for AI",
+    "cd-source-display", "def greet(self):",
+)
 
 
-def test_render_contains_imports(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
-    assert "IMPORTS" in html
-    assert "os" in html
-    assert "sys" in html
+def test_render_contains_expected_tokens(rendered_html):
+    _, html = rendered_html
+    missing = [tok for tok in REQUIRED_TOKENS if tok not in html]
+    assert not missing
 
 
-def test_render_contains_summary_placeholder(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
-    assert "AI summary pending..." in html
-
-
-def test_render_contains_quality_indicator(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
+def test_render_contains_quality_indicator(rendered_html):
+    _, html = rendered_html
     assert "\U0001f7e2" in html
 
 
-def test_render_contains_line_counts(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
-    assert "10 lines" in html
-
-
-def test_render_valid_html(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
+def test_render_valid_html(rendered_html):
+    _, html = rendered_html
     assert html.startswith("<!DOCTYPE html>")
     assert "<html" in html
     assert "</html>" in html
@@ -190,16 +176,6 @@ def test_render_interactive_returns_html():
 # ---------------------------------------------------------------------------
 
 
-def test_render_contains_code_action_buttons(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
-    assert "Show Code" in html
-    assert "Export Code" in html
-    assert "Copy for AI" in html
-
-
 def test_render_no_code_buttons_for_directory(tmp_path):
     """Directories should not have code export buttons."""
     root = CodeNode(
@@ -214,21 +190,12 @@ def test_render_no_code_buttons_for_directory(tmp_path):
     )
     out = str(tmp_path / "output.html")
     render(root, out)
-    html = open(out).read()
+    html = Path(out).read_text(encoding="utf-8")
     assert "Show Code</button>" not in html
     assert "Export Code</button>" not in html
     assert "Copy for AI</button>" not in html
 
 
-def test_render_source_display_contains_code(tmp_path):
-    root = _make_tree()
-    out = str(tmp_path / "output.html")
-    render(root, out)
-    html = open(out).read()
-    assert "cd-source-display" in html
-    assert "def greet(self):" in html
-
-
 def test_render_interactive_contains_code_action_buttons():
     from codedocent.analyzer import assign_node_ids
     from codedocent.renderer import render_interactive
@@ -284,7 +251,7 @@ def test_render_escapes_html_in_names(tmp_path):
     )
     out = str(tmp_path / "output.html")
     render(root, out)
-    html = open(out).read()
+    html = Path(out).read_text(encoding="utf-8")
 
     # The escaped version must be present
     assert "&lt;script&gt;" in html
@@ -1,117 +1,162 @@
 """Tests for codedocent.scanner."""
 
 import os
-import tempfile
+from pathlib import Path
 
 from codedocent.scanner import scan_directory
 
 
 def _create_tree(root: str, files: dict[str, bytes]) -> None:
     """Create files in a temp directory."""
-    for rel_path, content in files.items():
-        full = os.path.join(root, rel_path)
-        os.makedirs(os.path.dirname(full), exist_ok=True)
-        with open(full, "wb") as f:
-            f.write(content)
-
-
-def test_finds_known_extensions():
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {
-            "main.py": b"print('hi')\n",
-            "app.js": b"console.log('hi');\n",
-            "style.css": b"body {}\n",
-        })
-        results = scan_directory(tmp)
-        names = {r.filepath for r in results}
-        assert names == {"main.py", "app.js", "style.css"}
-
-
-def test_skips_git_and_pycache():
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {
-            "good.py": b"x = 1\n",
-            ".git/config": b"[core]\n",
-            "__pycache__/mod.cpython-312.pyc": b"\x00\x00",
-            "node_modules/pkg/index.js": b"module.exports = {};\n",
-        })
-        results = scan_directory(tmp)
-        assert len(results) == 1
-        assert results[0].filepath == "good.py"
-
-
-def test_skips_binary_files():
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {
-            "good.py": b"x = 1\n",
-            "bad.py": b"x = 1\n\x00\x00binary\x00data\n",
-        })
-        results = scan_directory(tmp)
-        assert len(results) == 1
-        assert results[0].filepath == "good.py"
-
-
-def test_respects_gitignore():
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {
-            ".gitignore": b"ignored.py\nsecrets/\n",
-            "kept.py": b"x = 1\n",
-            "ignored.py": b"secret = 'oops'\n",
-            "secrets/key.py": b"key = '123'\n",
-        })
-        results = scan_directory(tmp)
-        names = {r.filepath for r in results}
-        assert names == {"kept.py"}
-
-
-def test_language_mapping():
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {
-            "a.py": b"x=1\n",
-            "b.ts": b"x=1\n",
-            "c.rs": b"fn main(){}\n",
-            "d.go": b"package main\n",
-            "e.unknown": b"???\n",
-        })
-        results = scan_directory(tmp)
-        lang_map = {r.filepath: r.language for r in results}
-        assert lang_map == {
-            "a.py": "python",
-            "b.ts": "typescript",
-            "c.rs": "rust",
-            "d.go": "go",
-        }
-
-
-def test_sorted_output():
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {
-            "z.py": b"x=1\n",
-            "a.py": b"x=1\n",
-            "m/b.py": b"x=1\n",
-        })
-        results = scan_directory(tmp)
-        paths = [r.filepath for r in results]
-        assert paths == sorted(paths)
-
-
-def test_jsx_maps_to_javascript():
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {"app.jsx": b"const x = <div/>;\n"})
-        results = scan_directory(tmp)
-        assert results[0].language == "javascript"
-
-
-def test_skips_fifo():
+    paths = {os.path.join(root, rel_path): content
+             for rel_path, content in files.items()}
+    for parent in {os.path.dirname(full) for full in paths}:
+        os.makedirs(parent, exist_ok=True)
+    for full, content in paths.items():
+        Path(full).write_bytes(content)
+
+
+def test_finds_known_extensions(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "main.py": b"print('hi')\n",
+        "app.js": b"console.log('hi');\n",
+        "style.css": b"body {}\n",
+    })
+    results = scan_directory(tmp)
+    names = {r.filepath for r in results}
+    assert names == {"main.py", "app.js", "style.css"}
+
+
+def test_skips_git_and_pycache(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "good.py": b"x = 1\n",
+        ".git/config": b"[core]\n",
+        "__pycache__/mod.cpython-312.pyc": b"\x00\x00",
+        "node_modules/pkg/index.js": b"module.exports = {};\n",
+    })
+    results = scan_directory(tmp)
+    assert len(results) == 1
+    assert results[0].filepath == "good.py"
+
+
+def test_skips_binary_files(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "good.py": b"x = 1\n",
+        "bad.py": b"x = 1\n\x00\x00binary\x00data\n",
+    })
+    results = scan_directory(tmp)
+    assert len(results) == 1
+    assert results[0].filepath == "good.py"
+
+
+def test_respects_gitignore(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        ".gitignore": b"ignored.py\nsecrets/\n",
+        "kept.py": b"x = 1\n",
+        "ignored.py": b"secret = 'oops'\n",
+        "secrets/key.py": b"key = '123'\n",
+    })
+    results = scan_directory(tmp)
+    names = {r.filepath for r in results}
+    assert names == {"kept.py"}
+
+
+def test_language_mapping(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "a.py": b"x=1\n",
+        "b.ts": b"x=1\n",
+        "c.rs": b"fn main(){}\n",
+        "d.go": b"package main\n",
+        "e.unknown": b"???\n",
+    })
+    results = scan_directory(tmp)
+    lang_map = {r.filepath: r.language for r in results}
+    assert lang_map == {
+        "a.py": "python",
+        "b.ts": "typescript",
+        "c.rs": "rust",
+        "d.go": "go",
+    }
+
+
+def test_sorted_output(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "z.py": b"x=1\n",
+        "a.py": b"x=1\n",
+        "m/b.py": b"x=1\n",
+    })
+    results = scan_directory(tmp)
+    paths = [r.filepath for r in results]
+    assert paths == sorted(paths)
+
+
+def test_jsx_maps_to_javascript(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {"app.jsx": b"const x = <div/>;\n"})
+    results = scan_directory(tmp)
+    assert results[0].language == "javascript"
+
+
+def test_skips_fifo(tmp_path):
     """scan_directory() should skip FIFOs and not hang."""
-    with tempfile.TemporaryDirectory() as tmp:
-        _create_tree(tmp, {
-            "good.py": b"x = 1\n",
-        })
-        fifo_path = os.path.join(tmp, "trap.py")
-        os.mkfifo(fifo_path)
-
-        results = scan_directory(tmp)
-        names = {r.filepath for r in results}
-        assert names == {"good.py"}
-        assert "trap.py" not in names
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "good.py": b"x = 1\n",
+    })
+    fifo_path = os.path.join(tmp, "trap.py")
+    os.mkfifo(fifo_path)
+
+    results = scan_directory(tmp)
+    names = {r.filepath for r in results}
+    assert names == {"good.py"}
+    assert "trap.py" not in names
+
+
+def test_skips_symlinked_files(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {"good.py": b"x = 1\n"})
+    os.symlink(os.path.join(tmp, "good.py"), os.path.join(tmp, "link.py"))
+
+    results = scan_directory(tmp)
+    assert {r.filepath for r in results} == {"good.py"}
+
+
+def test_skips_symlinked_dirs(tmp_path):
+    tmp = str(tmp_path / "root")
+    outside = str(tmp_path / "outside")
+    _create_tree(tmp, {"good.py": b"x = 1\n"})
+    _create_tree(outside, {"leak.py": b"x = 2\n"})
+    os.symlink(outside, os.path.join(tmp, "linked"))
+
+    results = scan_directory(tmp)
+    assert {r.filepath for r in results} == {"good.py"}
+
+
+def test_skips_dot_dirs(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "good.py": b"x = 1\n",
+        ".hidden/secret.py": b"x = 2\n",
+        ".github/workflows/ci.yml": b"on: push\n",
+    })
+    results = scan_directory(tmp)
+    assert {r.filepath for r in results} == {"good.py"}
+
+
+def test_skips_dirs_in_skip_list(tmp_path):
+    tmp = str(tmp_path)
+    _create_tree(tmp, {
+        "good.py": b"x = 1\n",
+        "venv/lib/site.py": b"x = 2\n",
+        "build/out.js": b"x = 3;\n",
+        "pkg.egg-info/setup.py": b"x = 4\n",
+        "src/node_modules/dep.js": b"x = 5;\n",
+    })
+    results = scan_directory(tmp)
+    assert {r.filepath for r in results} == {"good.py"}
@@ -2,17 +2,33 @@
 
 from __future__ import annotations
 
+import io
 import json
 import os
+import shutil
+import socket
+import sys
 import threading
-import time
-from http.client import HTTPConnection
-from unittest.mock import MagicMock, patch
+from http.client import HTTPConnection, HTTPResponse
+from types import SimpleNamespace
+from unittest.mock import patch
 
 import pytest
 
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
 from codedocent.parser import CodeNode
-from codedocent.server import _Handler, _node_to_dict, MAX_BODY_SIZE
+from codedocent.server import (
+    _Handler, _dumps_json, _invalidate_tree_cache, _loads_json,
+    _node_to_dict, MAX_BODY_SIZE,
+)
+
+
+# Canonical on-disk source for the func node used by replace tests
+_ADD_SRC_BYTES = b"def add(a, b):\n    return a + b\n"
 
 
 # ---------------------------------------------------------------------------
@@ -83,17 +99,112 @@ def _make_tree() -> tuple[CodeNode, dict[str, CodeNode]]:
     return root, lookup
 
 
+def _read_body(resp) -> bytes:
+    """Read exactly Content-Length bytes from *resp* in one call."""
+    length = resp.getheader("Content-Length")
+    if length is None:
+        return resp.read()
+    return resp.read(int(length))
+
+
+class _BufferSocket:
+    """Minimal socket stand-in that reads from a fixed byte buffer."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def makefile(self, _mode: str):
+        return io.BytesIO(self._data)
+
+
+def _raw_request(
+    method: str,
+    path: str,
+    headers: dict[str, str] | None = None,
+    body: bytes = b"",
+) -> bytes:
+    """Encode one HTTP/1.1 request as it would arrive on the wire."""
+    lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1"]
+    headers = headers or {}
+    lines.extend(f"{k}: {v}" for k, v in headers.items())
+    if body and "Content-Length" not in headers:
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+
+def _run_handler(raw: bytes, *, keep_alive: bool = False) -> bytes:
+    """Feed *raw* to a socketless ``_Handler`` and return what it wrote.
+
+    With *keep_alive*, requests are served until the handler closes the
+    connection or the buffer runs out, as on a kept-alive socket.
+    """
+    handler = _Handler.__new__(_Handler)
+    handler.client_address = ("127.0.0.1", 0)
+    handler.connection = _BufferSocket(raw)
+    handler.rfile = handler.connection.makefile("rb")
+    handler.wfile = io.BytesIO()
+    if keep_alive:
+        handler.handle()
+    else:
+        handler.handle_one_request()
+    return handler.wfile.getvalue()
+
+
+def _invoke_handler(
+    method: str,
+    path: str,
+    headers: dict[str, str] | None = None,
+    body: bytes = b"",
+) -> HTTPResponse:
+    """Run one request through ``_Handler`` in-process, without a socket.
+
+    The request is parsed from an in-memory buffer and the bytes the
+    handler writes are parsed back into an ``HTTPResponse``.
+    """
+    out = _run_handler(_raw_request(method, path, headers, body))
+    resp = HTTPResponse(_BufferSocket(out))
+    resp.begin()
+    return resp
+
+
+# Replace-request bodies, encoded once and shared by label
+_BODIES: dict[str, bytes] = {
+    label: _dumps_json({"source": source})
+    for label, source in {
+        "pass": "pass",
+        "add_plus1": "def add(a, b):\n    return a + b + 1\n",
+        "add_plus2": "def add(a, b):\n    return a + b + 2\n",
+        "add_three_lines": "def add(a, b):\n    c = a + b\n    return c\n",
+        "hacked": "hacked = True\n",
+    }.items()
+}
+
+
+# Header dicts keyed by (kind, token); shared, so callers must not mutate
+_HDR_CACHE: dict[tuple[str, str], dict[str, str]] = {}
+
+
 def _post_headers() -> dict[str, str]:
     """Return headers dict with the current CSRF token."""
-    return {"X-Codedocent-Token": _Handler.csrf_token}
+    token = _Handler.csrf_token
+    key = ("plain", token)
+    if key not in _HDR_CACHE:
+        _HDR_CACHE[key] = {"X-Codedocent-Token": token}
+    return _HDR_CACHE[key]
 
 
 def _post_json_headers() -> dict[str, str]:
     """Return headers dict with CSRF token and JSON content type."""
-    return {
-        "Content-Type": "application/json",
-        "X-Codedocent-Token": _Handler.csrf_token,
-    }
+    token = _Handler.csrf_token
+    key = ("json", token)
+    if key not in _HDR_CACHE:
+        _HDR_CACHE[key] = {
+            "Content-Type": "application/json",
+            "X-Codedocent-Token": token,
+        }
+    return _HDR_CACHE[key]
 
 
 # ---------------------------------------------------------------------------
@@ -101,45 +212,139 @@ def _post_json_headers() -> dict[str, str]:
 # ---------------------------------------------------------------------------
 
 
-def test_node_to_dict_excludes_source_by_default():
+@pytest.mark.parametrize("include_source", [False, True])
+def test_node_to_dict_source_toggle(include_source):
+    """``source`` is excluded by default and included when requested."""
     node = _make_func_node(source="def add(a, b):\n    return a + b\n")
-    d = _node_to_dict(node)
-    assert "source" not in d
+    d = _node_to_dict(node, include_source=include_source)
     assert d["name"] == "add"
     assert d["node_type"] == "function"
     assert d["node_id"] == "abc123def456"
+    if include_source:
+        assert "def add" in d["source"]
+    else:
+        assert "source" not in d
 
 
-def test_node_to_dict_includes_source_when_requested():
-    node = _make_func_node(source="def add(a, b):\n    return a + b\n")
-    d = _node_to_dict(node, include_source=True)
-    assert "source" in d
-    assert "def add" in d["source"]
+@pytest.fixture(scope="module")
+def sample_parent() -> CodeNode:
+    """A directory node with one function child; read-only for tests."""
+    child = _make_func_node(name="inner", node_id="child_id_1234")
+    return _make_dir_node(children=[child])
 
 
-def test_node_to_dict_serializes_children():
-    child = _make_func_node(name="inner", node_id="child_id_1234")
-    parent = _make_dir_node(children=[child])
-    d = _node_to_dict(parent)
+def test_node_to_dict_serializes_children(sample_parent):
+    d = _node_to_dict(sample_parent)
     assert len(d["children"]) == 1
     assert d["children"][0]["name"] == "inner"
     assert d["children"][0]["node_id"] == "child_id_1234"
 
 
+def test_node_to_dict_source_propagates_to_children(sample_parent):
+    """include_source=True should propagate to child nodes."""
+    d = _node_to_dict(sample_parent, include_source=True)
+    assert "source" in d["children"][0]
+    assert "def add" in d["children"][0]["source"]
+
+
+def test_node_to_dict_preserves_child_order():
+    inner = [_make_func_node(name=f"m{i}") for i in range(3)]
+    cls = _make_dir_node(name="cls", children=inner)
+    siblings = [cls] + [_make_func_node(name=f"f{i}") for i in range(3)]
+    d = _node_to_dict(_make_dir_node(children=siblings))
+    assert [c["name"] for c in d["children"]] == ["cls", "f0", "f1", "f2"]
+    assert [c["name"] for c in d["children"][0]["children"]] == [
+        "m0", "m1", "m2",
+    ]
+
+
+def test_node_to_dict_handles_trees_deeper_than_recursion_limit():
+    """Serialization is iterative, so very deep nesting does not overflow."""
+    root = _make_func_node(name="n0")
+    current = root
+    for i in range(1, sys.getrecursionlimit() + 100):
+        child = _make_func_node(name=f"n{i}")
+        current.children.append(child)
+        current = child
+    d = _node_to_dict(root)
+    depth = 0
+    while d["children"]:
+        d = d["children"][0]
+        depth += 1
+    assert depth == sys.getrecursionlimit() + 99
+    assert d["name"] == current.name
+
+
+def test_dumps_json_matches_stdlib_with_and_without_orjson():
+    """_dumps_json output parses identically with or without orjson."""
+    root, _ = _make_tree()
+    payload = _node_to_dict(root)
+    fast = _dumps_json(payload)
+    with patch("codedocent.server.orjson", None):
+        slow = _dumps_json(payload)
+    assert isinstance(fast, bytes) and isinstance(slow, bytes)
+    assert json.loads(fast) == json.loads(slow) == payload
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_loads_json_parses_and_rejects_invalid(use_orjson):
+    """_loads_json accepts UTF-8 JSON bytes and raises ValueError otherwise."""
+    import codedocent.server as server_mod
+
+    impl = server_mod.orjson if use_orjson else None
+    if use_orjson and impl is None:
+        pytest.skip("orjson not installed")
+    with patch("codedocent.server.orjson", impl):
+        assert _loads_json(b'{"source": "pass"}') == {"source": "pass"}
+        for bad in (b"this is not json", b"\xff\xfe"):
+            with pytest.raises(ValueError):
+                _loads_json(bad)
+
+
+def test_setup_resolves_real_root_per_session(tmp_path, monkeypatch):
+    """A relative root resolves against the cwd at each server setup."""
+    from codedocent.server import _setup_handler_state
+
+    # Restore the shared handler state _setup_handler_state overwrites
+    for name in (
+        "csrf_token", "html_content", "root", "node_lookup", "model",
+        "cache_dir", "real_root", "ai_config", "analyze_lock",
+        "last_request_time",
+    ):
+        monkeypatch.setattr(_Handler, name, getattr(_Handler, name))
+    for sub in ("first", "second"):
+        (tmp_path / sub).mkdir()
+        monkeypatch.chdir(tmp_path / sub)
+        root, lookup = _make_tree()
+        root.filepath = "."
+        _setup_handler_state(root, lookup, "test-model")
+        assert _Handler.real_root == os.path.realpath(tmp_path / sub)
+
+
 # ---------------------------------------------------------------------------
 # Server integration tests
 # ---------------------------------------------------------------------------
 
 
-@pytest.fixture()
-def server_fixture(tmp_path):
-    """Start server in background thread, yield (port, root, lookup), then shut down."""
+@pytest.fixture(scope="session")
+def live_server():
+    """Start one server in a background thread for the whole session.
+
+    Yields the port and shuts the server down at session end.
+    """
     root, lookup = _make_tree()
-    root.filepath = str(tmp_path)
 
-    from codedocent.server import _find_open_port, start_server
+    from codedocent.server import start_server
+
+    # Port 0 makes the OS pick while binding, so parallel xdist workers
+    # cannot race for a port probed free beforehand.  on_ready hands the
+    # listening server back, so there is nothing to poll for.
+    started: list = []
+    ready = threading.Event()
 
-    port = _find_open_port()
+    def _on_ready(server):
+        started.append(server)
+        ready.set()
 
     thread = threading.Thread(
         target=start_server,
@@ -147,147 +352,239 @@ def server_fixture(tmp_path):
             "root": root,
             "node_lookup": lookup,
             "model": "test-model",
-            "port": port,
+            "port": 0,
             "open_browser": False,
+            "on_ready": _on_ready,
         },
         daemon=True,
     )
     thread.start()
+    if not ready.wait(timeout=5):
+        pytest.fail("server did not start")
+    server = started[0]
+    port = server.server_address[1]
 
-    # Wait for server to be ready
-    for _ in range(50):
-        try:
-            conn = HTTPConnection("127.0.0.1", port, timeout=1)
-            conn.request("GET", "/")
-            conn.getresponse()
-            conn.close()
-            break
-        except Exception:
-            time.sleep(0.1)
-
-    yield port, root, lookup
+    yield port
 
-    # Shutdown
-    try:
-        conn = HTTPConnection("127.0.0.1", port, timeout=2)
-        conn.request("POST", "/shutdown", headers=_post_headers())
-        conn.getresponse()
-        conn.close()
-    except Exception:
-        pass
+    # Stop serve_forever directly; start_server closes the socket on exit
+    server.shutdown()
     thread.join(timeout=5)
 
 
-def test_get_root_returns_html(server_fixture):
-    port, _, _ = server_fixture
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+_CANNED_RESPONSE = SimpleNamespace(
+    message=SimpleNamespace(
+        content="SUMMARY: Adds two numbers together.\nPSEUDOCODE:\nadd a and b",
+    ),
+)
+
+
+class _FakeOllama:
+    """Stand-in for the ``ollama`` module with a canned chat reply.
+
+    Tests needing a different reply can monkeypatch ``response``.
+    """
+
+    response = _CANNED_RESPONSE
+
+    @classmethod
+    def chat(cls, *_args, **_kwargs):
+        return cls.response
+
+
+@pytest.fixture()
+def handler_state(tmp_path, monkeypatch):
+    """Install a fresh tree rooted in *tmp_path* as the handler state.
+
+    Returns (root, lookup).  Tests may mutate the tree, files and lookup
+    freely; the next test gets a new copy.  A CSRF token is installed when
+    no server has set one yet, so in-process tests still check it, and the
+    analyzer talks to ``_FakeOllama`` for the duration of the test.
+    """
+    if not _Handler.csrf_token:
+        monkeypatch.setattr(_Handler, "csrf_token", "test-csrf-token")
+    monkeypatch.setattr("codedocent.analyzer.ollama", _FakeOllama)
+    root, lookup = _make_tree()
+    root.filepath = str(tmp_path)
+    _Handler.root = root
+    _Handler.node_lookup = lookup
+    _Handler.cache_dir = str(tmp_path)
+    _Handler.real_root = os.path.realpath(tmp_path)
+    _invalidate_tree_cache()
+    return root, lookup
+
+
+@pytest.fixture()
+def server_fixture(live_server, handler_state):
+    """Point the shared server at a fresh tree; yields (port, root, lookup)."""
+    root, lookup = handler_state
+    yield live_server, root, lookup
+
+
+@pytest.fixture(scope="session")
+def _shared_conn(live_server):
+    """One keep-alive HTTP/1.1 connection to the session server."""
+    conn = HTTPConnection("127.0.0.1", live_server, timeout=10)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture()
+def http_conn(_shared_conn, request):
+    """Yield the shared connection, resetting it if the test failed.
+
+    A failing test may leave a response unread, which would make the next
+    request on the connection raise; closing makes it reconnect lazily.
+    """
+    failed_before = request.session.testsfailed
+    yield _shared_conn
+    if request.session.testsfailed != failed_before:
+        _shared_conn.close()
+
+
+def test_get_root_returns_html(server_fixture, http_conn):
+    conn = http_conn
     conn.request("GET", "/")
     resp = conn.getresponse()
     assert resp.status == 200
-    body = resp.read().decode()
-    assert "<!DOCTYPE html>" in body
-    assert "TREE_DATA" in body
-    conn.close()
+    body = _read_body(resp)
+    assert b"<!DOCTYPE html>" in body
+    assert b"TREE_DATA" in body
 
 
-def test_get_tree_returns_json(server_fixture):
-    port, _, _ = server_fixture
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+def test_get_tree_returns_json(server_fixture, http_conn):
+    conn = http_conn
     conn.request("GET", "/api/tree", headers=_post_headers())
     resp = conn.getresponse()
     assert resp.status == 200
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert data["name"] == "src"
     assert data["node_type"] == "directory"
     assert len(data["children"]) > 0
-    conn.close()
 
 
-def test_analyze_unknown_node_returns_404(server_fixture):
-    port, _, _ = server_fixture
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+def test_connection_kept_alive_between_requests(server_fixture, http_conn):
+    """Successful responses leave the HTTP/1.1 connection open for reuse."""
+    http_conn.request("GET", "/api/tree", headers=_post_headers())
+    _read_body(http_conn.getresponse())
+    sock = http_conn.sock
+    assert sock is not None
+    http_conn.request("GET", "/api/tree", headers=_post_headers())
+    resp = http_conn.getresponse()
+    assert resp.status == 200
+    _read_body(resp)
+    assert http_conn.sock is sock
+
+
+@pytest.mark.parametrize(
+    ("method", "body", "responses"),
+    [
+        ("GET", b"", 2),
+        ("GET", b"GET /api/tree HTTP/1.1\r\n\r\n", 1),
+        ("POST", b"", 2),
+        ("POST", b"GET /api/tree HTTP/1.1\r\n\r\n", 1),
+    ],
+    ids=["get", "get-with-body", "post", "post-with-body"],
+)
+def test_unread_request_body_closes_connection(
+    handler_state, method, body, responses,
+):
+    """Body bytes a handler does not read must not be parsed as the next
+    pipelined request; the connection is closed instead."""
+    path = "/api/source/abc123def456"
+    if method == "POST":
+        path = "/api/analyze/abc123def456"
+        handler_state[1]["abc123def456"].summary = "Already analyzed"
+    raw = (
+        _raw_request(method, path, _post_headers(), body)
+        + _raw_request("GET", "/api/tree", _post_headers())
+    )
+    out = _run_handler(raw, keep_alive=True)
+    assert out.count(b"HTTP/1.1 200 ") == responses
+    if responses == 1:
+        assert b"Connection: close" in out
+
+
+def test_handler_times_out_idle_connections(server_fixture, monkeypatch):
+    """The server closes a connection that sends nothing within timeout."""
+    port, _root, _lookup = server_fixture
+    # Read by each handler when its connection is set up
+    monkeypatch.setattr(_Handler, "timeout", 0.2)
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        assert sock.recv(1) == b""
+
+
+def test_idle_keep_alive_connection_does_not_block_others(server_fixture):
+    """Each connection gets its own handler thread, so an idle one
+    cannot hold up requests arriving on another."""
+    port, _root, _lookup = server_fixture
+    with socket.create_connection(("127.0.0.1", port), timeout=2):
+        conn = HTTPConnection("127.0.0.1", port, timeout=2)
+        try:
+            conn.request("GET", "/api/tree", headers=_post_headers())
+            resp = conn.getresponse()
+            assert resp.status == 200
+            _read_body(resp)
+        finally:
+            conn.close()
+
+
+def test_analyze_unknown_node_returns_404(handler_state):
+    resp = _invoke_handler(
         "POST", "/api/analyze/nonexistent999",
         headers=_post_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 404
-    conn.close()
+    _read_body(resp)
 
 
-@patch("codedocent.analyzer.ollama")
-def test_analyze_node_returns_summary(mock_ollama, server_fixture):
-    port, _, lookup = server_fixture
-
-    mock_response = MagicMock()
-    mock_response.message.content = (
-        "SUMMARY: Adds two numbers together.\nPSEUDOCODE:\nadd a and b"
-    )
-    mock_ollama.chat.return_value = mock_response
+def test_analyze_node_returns_summary(handler_state):
+    _, lookup = handler_state
 
     # Reset summary so it triggers AI
     func_node = lookup["abc123def456"]
     func_node.summary = None
 
-    conn = HTTPConnection("127.0.0.1", port, timeout=10)
-    conn.request(
+    resp = _invoke_handler(
         "POST", "/api/analyze/abc123def456",
         headers=_post_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 200
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert data["summary"] is not None
-    conn.close()
 
 
-def test_node_to_dict_source_propagates_to_children():
-    """include_source=True should propagate to child nodes."""
-    child = _make_func_node(name="inner", node_id="child_id_1234")
-    parent = _make_dir_node(children=[child])
-    d = _node_to_dict(parent, include_source=True)
-    assert "source" in d["children"][0]
-    assert "def add" in d["children"][0]["source"]
-
-
-def test_analyze_already_analyzed_returns_cached(server_fixture):
-    port, _, lookup = server_fixture
+def test_analyze_already_analyzed_returns_cached(handler_state):
+    _, lookup = handler_state
 
     # Pre-set a summary
     func_node = lookup["abc123def456"]
     func_node.summary = "Already analyzed"
 
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    resp = _invoke_handler(
         "POST", "/api/analyze/abc123def456",
         headers=_post_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 200
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert data["summary"] == "Already analyzed"
-    conn.close()
 
 
-def test_analyze_response_includes_source(server_fixture):
+def test_analyze_response_includes_source(handler_state):
     """The /api/analyze/<id> response should include source code."""
-    port, _, lookup = server_fixture
+    _, lookup = handler_state
 
     # Pre-set a summary so no AI call is needed
     func_node = lookup["abc123def456"]
     func_node.summary = "Test summary"
 
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    resp = _invoke_handler(
         "POST", "/api/analyze/abc123def456",
         headers=_post_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 200
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "source" in data
     assert "def add" in data["source"]
-    conn.close()
 
 
 # ---------------------------------------------------------------------------
@@ -295,72 +592,109 @@ def test_analyze_response_includes_source(server_fixture):
 # ---------------------------------------------------------------------------
 
 
-def _write_func_file(tmp_path):
-    """Write a real file matching the func node's filepath for replacement."""
+@pytest.fixture(scope="session")
+def func_template(tmp_path_factory):
+    """Write the canonical ``add`` source once for all replace tests."""
+    tpl = tmp_path_factory.mktemp("tpl") / "test.py"
+    tpl.write_bytes(_ADD_SRC_BYTES)
+    return tpl
+
+
+def _write_func_file(tmp_path, template):
+    """Link *template* to the func node's filepath for replacement.
+
+    Hardlinking is safe because the editor swaps files in with
+    ``os.replace`` rather than writing through the existing inode.
+    """
     p = tmp_path / "test.py"
-    p.write_text("def add(a, b):\n    return a + b\n", encoding="utf-8")
+    try:
+        os.link(template, p)
+    except OSError:
+        shutil.copyfile(template, p)
     return p
 
 
-def test_replace_unknown_node_returns_404(server_fixture):
-    port, _, _ = server_fixture
-    body = json.dumps({"source": "pass"}).encode()
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+def test_replace_unknown_node_returns_404(handler_state):
+    body = _BODIES["pass"]
+    resp = _invoke_handler(
         "POST", "/api/replace/nonexistent999",
         body=body,
         headers=_post_json_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 404
-    conn.close()
+    _read_body(resp)
 
 
-def test_replace_node_returns_success(server_fixture, tmp_path):
-    port, root, lookup = server_fixture
+def test_replace_node_returns_success(handler_state, tmp_path, func_template):
+    root, lookup = handler_state
 
     # Write the source file to the root's filepath directory
-    _write_func_file(tmp_path)
+    _write_func_file(tmp_path, func_template)
 
     func_node = lookup["abc123def456"]
     func_node.summary = "Old summary"
 
-    new_code = "def add(a, b):\n    return a + b + 1\n"
-    body = json.dumps({"source": new_code}).encode()
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    body = _BODIES["add_plus1"]
+    resp = _invoke_handler(
         "POST", "/api/replace/abc123def456",
         body=body,
         headers=_post_json_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 200
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert data["success"] is True
-    conn.close()
 
 
-def test_replace_clears_summary(server_fixture, tmp_path):
-    port, root, lookup = server_fixture
+def test_tree_cache_invalidated_by_replace(
+    server_fixture, tmp_path, http_conn, func_template,
+):
+    """/api/tree is served from cache until a replace changes the tree."""
+    _write_func_file(tmp_path, func_template)
+
+    def _get_tree() -> dict:
+        conn = http_conn
+        conn.request("GET", "/api/tree", headers=_post_headers())
+        resp = conn.getresponse()
+        assert resp.status == 200
+        data = _loads(_read_body(resp))
+        return data
+
+    before = _get_tree()
+    assert _Handler.tree_cache is not None
+    assert _get_tree() == before
+
+    conn = http_conn
+    conn.request(
+        "POST", "/api/replace/abc123def456",
+        body=_BODIES["add_three_lines"],
+        headers=_post_json_headers(),
+    )
+    resp = conn.getresponse()
+    assert resp.status == 200
+    _read_body(resp)
+
+    after = _get_tree()
+    assert after != before
+    assert after["children"][0]["children"][0]["line_count"] == 3
+
 
-    _write_func_file(tmp_path)
+def test_replace_clears_summary(handler_state, tmp_path, func_template):
+    root, lookup = handler_state
+
+    _write_func_file(tmp_path, func_template)
 
     func_node = lookup["abc123def456"]
     func_node.summary = "Will be cleared"
     func_node.pseudocode = "Will be cleared"
 
-    new_code = "def add(a, b):\n    return a + b + 2\n"
-    body = json.dumps({"source": new_code}).encode()
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    body = _BODIES["add_plus2"]
+    resp = _invoke_handler(
         "POST", "/api/replace/abc123def456",
         body=body,
         headers=_post_json_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 200
-    resp.read()
-    conn.close()
+    _read_body(resp)
 
     assert func_node.summary is None
     assert func_node.pseudocode is None
@@ -371,36 +705,59 @@ def test_replace_clears_summary(server_fixture, tmp_path):
 # ---------------------------------------------------------------------------
 
 
-def test_get_source_returns_source(server_fixture):
+def test_get_source_returns_source(handler_state):
     """GET /api/source/{node_id} returns source without triggering analysis."""
-    port, _, lookup = server_fixture
+    _, lookup = handler_state
 
     # Ensure summary is None — source endpoint should NOT trigger AI
     func_node = lookup["abc123def456"]
     func_node.summary = None
 
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request("GET", "/api/source/abc123def456", headers=_post_headers())
-    resp = conn.getresponse()
+    resp = _invoke_handler(
+        "GET", "/api/source/abc123def456", headers=_post_headers(),
+    )
     assert resp.status == 200
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "source" in data
     assert "def add" in data["source"]
-    conn.close()
 
     # Summary should still be None — no AI was triggered
     assert func_node.summary is None
 
 
-def test_get_source_unknown_node_returns_404(server_fixture):
-    port, _, _ = server_fixture
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+def test_get_source_unknown_node_returns_404(handler_state):
+    resp = _invoke_handler(
         "GET", "/api/source/nonexistent999", headers=_post_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 404
-    conn.close()
+    _read_body(resp)
+
+
+def test_shutdown_route_stops_server(handler_state, monkeypatch):
+    """POST /shutdown answers, then shuts the server down off-thread."""
+    stopped = threading.Event()
+    monkeypatch.setattr(
+        _Handler, "server_ref", SimpleNamespace(shutdown=stopped.set),
+    )
+    resp = _invoke_handler("POST", "/shutdown", headers=_post_headers())
+    assert resp.status == 200
+    assert _read_body(resp) == b"OK"
+    assert stopped.wait(timeout=5)
+
+
+@pytest.mark.parametrize(
+    ("method", "path"),
+    [
+        ("GET", "/api/nope"),
+        ("GET", "/api/tree/extra"),
+        ("GET", "/api/sources/abc123def456"),
+        ("POST", "/api/shutdown"),
+        ("POST", "/api/analyzer/abc123def456"),
+    ],
+)
+def test_unrouted_api_paths_return_404(handler_state, method, path):
+    resp = _invoke_handler(method, path, headers=_post_headers())
+    assert resp.status == 404
 
 
 # ---------------------------------------------------------------------------
@@ -408,61 +765,49 @@ def test_get_source_unknown_node_returns_404(server_fixture):
 # ---------------------------------------------------------------------------
 
 
-def test_get_api_without_csrf_token_returns_403(server_fixture):
-    port, _, _ = server_fixture
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request("GET", "/api/tree")
-    resp = conn.getresponse()
+def test_get_api_without_csrf_token_returns_403(handler_state):
+    resp = _invoke_handler("GET", "/api/tree")
     assert resp.status == 403
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "CSRF" in data["error"]
-    conn.close()
 
 
-def test_post_without_csrf_token_returns_403(server_fixture):
-    port, _, lookup = server_fixture
+def test_post_without_csrf_token_returns_403(handler_state):
+    _, lookup = handler_state
     func_node = lookup["abc123def456"]
     func_node.summary = "Already analyzed"
 
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request("POST", "/api/analyze/abc123def456")
-    resp = conn.getresponse()
+    resp = _invoke_handler("POST", "/api/analyze/abc123def456")
     assert resp.status == 403
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "CSRF" in data["error"]
-    conn.close()
 
 
-def test_post_with_wrong_csrf_token_returns_403(server_fixture):
-    port, _, lookup = server_fixture
+def test_post_with_wrong_csrf_token_returns_403(handler_state):
+    _, lookup = handler_state
     func_node = lookup["abc123def456"]
     func_node.summary = "Already analyzed"
 
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    resp = _invoke_handler(
         "POST", "/api/analyze/abc123def456",
         headers={"X-Codedocent-Token": "wrong-token-value"},
     )
-    resp = conn.getresponse()
     assert resp.status == 403
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "CSRF" in data["error"]
-    conn.close()
 
 
-def test_post_with_correct_csrf_token_succeeds(server_fixture):
-    port, _, lookup = server_fixture
+def test_post_with_correct_csrf_token_succeeds(handler_state):
+    _, lookup = handler_state
     func_node = lookup["abc123def456"]
     func_node.summary = "Already analyzed"
 
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    resp = _invoke_handler(
         "POST", "/api/analyze/abc123def456",
         headers=_post_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 200
-    conn.close()
+    _read_body(resp)
 
 
 # ---------------------------------------------------------------------------
@@ -470,14 +815,14 @@ def test_post_with_correct_csrf_token_succeeds(server_fixture):
 # ---------------------------------------------------------------------------
 
 
-def test_symlink_replace_rejected(server_fixture, tmp_path):
-    port, root, lookup = server_fixture
+def test_symlink_replace_rejected(handler_state, tmp_path):
+    root, lookup = handler_state
 
     # Create a target file truly outside the project root (tmp_path)
     outside = tmp_path.parent / "symlink_escape_target"
     outside.mkdir(exist_ok=True)
     target = outside / "secret.py"
-    target.write_text("secret = True\n", encoding="utf-8")
+    target.write_bytes(b"secret = True\n")
 
     # Create a symlink inside the project root pointing outside
     link = tmp_path / "evil.py"
@@ -495,20 +840,19 @@ def test_symlink_replace_rejected(server_fixture, tmp_path):
         line_count=1,
         node_id="evil_node_1234",
     )
-    _Handler.node_lookup["evil_node_1234"] = evil_node
+    # handler_state installed *lookup* as the handler's table for this
+    # test only, so the injected node cannot leak into later tests
+    lookup["evil_node_1234"] = evil_node
 
-    body = json.dumps({"source": "hacked = True\n"}).encode()
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    body = _BODIES["hacked"]
+    resp = _invoke_handler(
         "POST", "/api/replace/evil_node_1234",
         body=body,
         headers=_post_json_headers(),
     )
-    resp = conn.getresponse()
     assert resp.status == 403
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "escapes" in data["error"]
-    conn.close()
 
 
 # ---------------------------------------------------------------------------
@@ -516,73 +860,51 @@ def test_symlink_replace_rejected(server_fixture, tmp_path):
 # ---------------------------------------------------------------------------
 
 
-def test_replace_missing_content_length_returns_400(server_fixture):
+def test_replace_missing_content_length_returns_400(handler_state):
     """POST to /api/replace without Content-Length returns 400."""
-    port, _, _ = server_fixture
-
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    resp = _invoke_handler(
         "POST", "/api/replace/abc123def456",
-        headers={
-            "X-Codedocent-Token": _Handler.csrf_token,
-            "Transfer-Encoding": "chunked",
-        },
+        headers={**_post_headers(), "Transfer-Encoding": "chunked"},
     )
-    resp = conn.getresponse()
     # The server should return 400 for missing Content-Length
     assert resp.status == 400
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "Content-Length" in data["error"]
-    conn.close()
 
 
-def test_replace_invalid_content_length_returns_400(server_fixture):
+def test_replace_invalid_content_length_returns_400(handler_state):
     """POST with non-numeric Content-Length returns 400."""
-    port, _, _ = server_fixture
-
-    import http.client
-    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.putrequest("POST", "/api/replace/abc123def456")
-    conn.putheader("X-Codedocent-Token", _Handler.csrf_token)
-    conn.putheader("Content-Length", "abc")
-    conn.endheaders()
-    conn.send(b"test")
-
-    resp = conn.getresponse()
+    resp = _invoke_handler(
+        "POST", "/api/replace/abc123def456",
+        headers={**_post_headers(), "Content-Length": "abc"},
+        body=b"test",
+    )
     assert resp.status == 400
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "Content-Length" in data["error"]
-    conn.close()
 
 
-def test_replace_oversized_body_returns_413(server_fixture):
+def test_replace_oversized_body_returns_413(handler_state):
     """POST with Content-Length exceeding MAX_BODY_SIZE returns 413."""
-    port, _, _ = server_fixture
-
-    import http.client
-    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.putrequest("POST", "/api/replace/abc123def456")
-    conn.putheader("X-Codedocent-Token", _Handler.csrf_token)
-    conn.putheader("Content-Type", "application/json")
-    conn.putheader("Content-Length", str(MAX_BODY_SIZE + 1))
-    conn.endheaders()
     # Don't actually send a huge body, just the header is enough
-    conn.send(b"{}")
-
-    resp = conn.getresponse()
+    resp = _invoke_handler(
+        "POST", "/api/replace/abc123def456",
+        headers={
+            **_post_json_headers(),
+            "Content-Length": str(MAX_BODY_SIZE + 1),
+        },
+        body=b"{}",
+    )
     assert resp.status == 413
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "too large" in data["error"]
-    conn.close()
 
 
-def test_replace_invalid_json_returns_400(server_fixture):
+def test_replace_invalid_json_returns_400(handler_state):
     """POST with non-JSON body returns 400."""
-    port, _, _ = server_fixture
 
     bad_body = b"this is not json"
-    conn = HTTPConnection("127.0.0.1", port, timeout=5)
-    conn.request(
+    resp = _invoke_handler(
         "POST", "/api/replace/abc123def456",
         body=bad_body,
         headers={
@@ -591,11 +913,9 @@ def test_replace_invalid_json_returns_400(server_fixture):
             "Content-Length": str(len(bad_body)),
         },
     )
-    resp = conn.getresponse()
     assert resp.status == 400
-    data = json.loads(resp.read())
+    data = _loads(_read_body(resp))
     assert "Invalid JSON" in data["error"]
-    conn.close()
 
 
 # ---------------------------------------------------------------------------